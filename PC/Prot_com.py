@@ -1,23 +1,16 @@
+import collections
 import serial
 import threading
-import time
-
-# ================= CMD =================
-CMD_START     = 0x01
-CMD_RESTART   = 0x02
-CMD_GIVEUP    = 0x03
-CMD_SET       = 0x04
-CMD_CLEAR     = 0x05
-CMD_CLEARALL  = 0x06
-CMD_FIELD     = 0x07
-
-# ================= STATUS =================
-STATUS_OK       = 0x10
-STATUS_INVALID  = 0x11
-STATUS_LOCKED   = 0x12
-STATUS_CHKERR   = 0x13
-STATUS_LOSE     = 0x14
-STATUS_WIN      = 0x15
+
+import codec
+import serial_rx
+from board import BoardModel
+from codec import (CMD_START, CMD_RESTART, CMD_GIVEUP, CMD_SET, CMD_CLEAR, CMD_CLEARALL, CMD_FIELD,
+                   CMD_DIFFICULTY, CMD_VERSION, CMD_SYNC, CMD_BULKSET, CMD_HELP, PROTOCOL_VERSION, MAX_BULK, DELTA_FLAG, NO_SEQ,
+                   STATUS_OK, STATUS_DELTA, STATUS_FULL, STATUS_INVALID, STATUS_LOCKED, STATUS_CHKERR,
+                   STATUS_LOSE, STATUS_WIN, STATUS_SETDIF, STATUS_NOOB)
+from frame_parser import FrameParser
+from link_stats import LinkStats
 
 STATUS_TEXT = {
     STATUS_OK:      "OK",
@@ -25,15 +18,31 @@ STATUS_TEXT = {
     STATUS_LOCKED:  "LOCKED",
     STATUS_LOSE:    "YOU LOSE",
     STATUS_WIN:     "YOU WIN",
-    STATUS_CHKERR:  "CHECKSUM ERROR"
+    STATUS_CHKERR:  "CHECKSUM ERROR",
+    STATUS_SETDIF:  "DIFFICULTY SET",
+    STATUS_NOOB:    "HINT"
 }
 
 # ================= UART GAME CONTROLLER =================
 class UARTSudokuGame:
-    def __init__(self, port, baud=115200):
+    def __init__(self, port, baud=115200, protocol=PROTOCOL_VERSION):
         self.ser = serial.Serial(port, baud, timeout=0.1)
         self.running = True
 
+        # Протокол: v1, доки плата не підтвердить v2 у рукостисканні
+        self.version = 1
+        self._encode = codec.encode
+        self._version_reply = threading.Event()
+        # Відповідь на SET для покрокового set_cells на v1
+        self._set_reply = threading.Event()
+        self._set_status = None
+
+        # Дзеркало поля плати: недопустимі ходи відсіюються ще до відправки
+        self.board = BoardModel()
+        self.stats = LinkStats()
+        # Ходи з надісланих CMD_BULKSET: відповідь несе лише статуси, відповіді йдуть по черзі
+        self._bulk = collections.deque()
+
         # -------- callbacks (ПОДІЇ) --------
         self.on_field      = None   # def f(field_9x9)
         self.on_status     = None   # def f(text)
@@ -41,30 +50,48 @@ class UARTSudokuGame:
         self.on_lose       = None
         self.on_invalid    = None
         self.on_locked     = None
+        self.on_reply      = None   # def f(cmd, status, b1, b2, b3) — кожна коротка відповідь
+        self.on_bulk       = None   # def f(moves, statuses) — відповідь на set_cells, статус на кожен хід
 
         self.rx_thread = threading.Thread(
             target=self._rx_loop, daemon=True
         )
         self.rx_thread.start()
-
-    # ================= UTILS =================
-    @staticmethod
-    def xor(data):
-        c = 0
-        for b in data:
-            c ^= b
-        return c & 0xFF
+        if protocol >= 2:
+            self.negotiate()
 
     # ================= SEND =================
     def _send(self, cmd, b1=0, b2=0, b3=0):
-        pkt = bytes([cmd, b1, b2, b3, cmd ^ b1 ^ b2 ^ b3])
+        pkt = self._encode(cmd, b1, b2, b3)
         self.ser.write(pkt)
+        self.stats.on_tx(pkt)
+
+    def negotiate(self, timeout=0.3):
+        # -> версія протоколу. Стара прошивка на CMD_VERSION не відповідає: тайм-аут = v1
+        self._version_reply.clear()
+        self._send(CMD_VERSION, PROTOCOL_VERSION)
+        self._version_reply.wait(timeout)
+        return self.version
+
+    def _since(self, seq=None):
+        # v2: b1:b2 — останній застосований seq, b3 — прохання відповісти дельтою
+        if self.version < 2:
+            return 0, 0, 0
+        seq = self.board.seq if seq is None else seq
+        if seq is None:
+            seq = NO_SEQ
+        return seq >> 8, seq & 0xFF, DELTA_FLAG
 
     def start_game(self):
-        self._send(CMD_START)
+        self._send(CMD_START, *self._since(NO_SEQ))
 
     def restart_game(self):
-        self._send(CMD_RESTART)
+        self._send(CMD_RESTART, *self._since())
+
+    def sync_field(self, full=False):
+        # Лише v2: зміни поля після нашого seq (або все поле, якщо full)
+        if self.version >= 2:
+            self._send(CMD_SYNC, *self._since(NO_SEQ if full else None)[:2])
 
     def give_up(self):
         self._send(CMD_GIVEUP)
@@ -72,57 +99,133 @@ class UARTSudokuGame:
     def request_field(self):
         self._send(CMD_FIELD)
 
+    def select_difficulty(self, level):
+        self._send(CMD_DIFFICULTY, level)
+
     def clear_all(self):
         self._send(CMD_CLEARALL)
 
     def set_cell(self, r, c, v):
-        self._send(CMD_SET, r, c, v)
+        # -> статус локальної перевірки; лише STATUS_OK іде на плату
+        status = self.board.check(r, c, v)
+        if status == STATUS_OK:
+            self._send(CMD_SET, r, c, v)
+        else:
+            self._handle_status(status)
+        return status
+
+    def set_cells(self, moves, timeout=0.2):
+        # moves — (r, c, v). v2: усі ходи одним кадром (до MAX_BULK на кадр), одна відповідь
+        # зі статусом кожного ходу; v1: звичайні SET по одному, з локальною перевіркою.
+        # Прошивка v1 відповідає з колбека прийому, тож наступний SET іде лише після
+        # відповіді на попередній: на v1 виклик блокує, не викликати з потоку Tk.
+        # -> скільки кадрів пішло на плату
+        moves = list(moves)
+        for r, c, _ in moves:
+            if not (0 <= r < 9 and 0 <= c < 9):
+                raise ValueError(f"cell ({r}, {c}) is off the board")
+        if self.version < 2:
+            return self._set_cells_v1(moves, timeout)
+        frames = 0
+        for k in range(0, len(moves), MAX_BULK):
+            chunk = moves[k:k + MAX_BULK]
+            pkt = codec.encode_bulk_v2(chunk)
+            # У черзі до запису: відповідь може прийти раніше, ніж write() поверне керування
+            self._bulk.append(chunk)
+            self.ser.write(pkt)
+            self.stats.on_tx(pkt)
+            frames += 1
+        return frames
+
+    def _set_cells_v1(self, moves, timeout):
+        # Stop-and-wait: статуси збираються як у відповіді CMD_BULKSET і йдуть в on_bulk
+        statuses = []
+        frames = 0
+        for r, c, v in moves:
+            self._set_reply.clear()
+            status = self.set_cell(r, c, v)
+            if status == STATUS_OK:
+                frames += 1
+                if not self._set_reply.wait(timeout):
+                    raise TimeoutError(f"no reply to SET ({r}, {c}) = {v} after {frames - 1} confirmed")
+                status = self._set_status
+                if status == STATUS_WIN:
+                    # Відповідь WIN несе 7,7,7 замість клітинки: хід відомий лише з запиту
+                    self.board.place(r, c, v)
+            statuses.append(status)
+        if self.on_bulk:
+            self.on_bulk(moves, statuses)
+        return frames
 
     def clear_cell(self, r, c):
+        if self.board.is_given(r, c):
+            self._handle_status(STATUS_LOCKED)
+            return STATUS_LOCKED
         self._send(CMD_CLEAR, r, c, 0)
+        return STATUS_OK
+
+    def help_cell(self, r, c):
+        self._send(CMD_HELP, r, c, 0)
 
     # ================= RX =================
     def _rx_loop(self):
-        while self.running and self.ser.is_open:
-            try:
-                first = self.ser.read(1)
-                if not first:
-                    continue
-
-                cmd = first[0]
-
-                # -------- FIELD --------
-                if cmd == CMD_FIELD:
-                    payload = self.ser.read(82)
-                    if len(payload) != 82:
-                        continue
-
-                    status = payload[0]
-                    field  = payload[1:82]
-                    chk    = payload[81]
-
-                    if chk != self.xor([cmd, status, *field]):
-                        self._emit_status(STATUS_CHKERR)
-                        continue
-
-                    self._handle_field(status, field)
-
-                # -------- SHORT --------
-                else:
-                    payload = self.ser.read(5)
-                    if len(payload) != 5:
-                        continue
-
-                    status, b1, b2, b3, chk = payload
-
-                    if chk != (cmd ^ status ^ b1 ^ b2 ^ b3):
-                        self._emit_status(STATUS_CHKERR)
-                        continue
-
-                    self._handle_status(status)
-
-            except serial.SerialException:
-                break
+        # Блокуючі читання розміром з кадр: потік спить, доки немає байтів
+        try:
+            parser = FrameParser()
+            self.stats.attach(parser)
+            serial_rx.pump(self.ser, parser, self._on_frame, lambda: self.running, self.stats.on_rx)
+        except serial.SerialException:
+            pass
+
+    def _on_frame(self, frame):
+        self.stats.on_frame(frame)
+        if not frame.crc_ok:
+            self._emit_status(STATUS_CHKERR)
+            return
+
+        if frame.cmd == CMD_VERSION:
+            # Парсер перейшов на v2 сам, кодер — тут
+            self.version = frame.payload[0] if frame.status == STATUS_OK else 1
+            self._encode = codec.encode_v2 if self.version >= 2 else codec.encode
+            self._version_reply.set()
+            return
+
+        if frame.cmd == CMD_BULKSET:
+            self._on_bulk(frame)
+            return
+
+        in_sync = self.board.apply_reply(frame.cmd, frame.status, frame.payload)
+        if frame.status == STATUS_DELTA or frame.status == STATUS_FULL:
+            if not in_sync:
+                # Дельта від чужого seq: пропустили відповідь — просимо поле повністю
+                self.sync_field(full=True)
+                return
+            self._handle_field(STATUS_OK, self.board.cells)
+            return
+        if frame.is_long:
+            self._handle_field(frame.status, bytes(frame.payload))
+        else:
+            if self.on_reply:
+                self.on_reply(frame.cmd, frame.status, *frame.payload)
+            self._handle_status(frame.status)
+            if frame.cmd == CMD_SET:
+                # Модель уже оновлена: наступна локальна перевірка бачить цей хід
+                self._set_status = frame.status
+                self._set_reply.set()
+
+    def _on_bulk(self, frame):
+        if not self._bulk:
+            return
+        moves = self._bulk.popleft()
+        if frame.status == STATUS_OK or frame.status == STATUS_WIN:
+            statuses = codec.decode_bulk(frame.payload)
+        else:
+            # CHKERR чи зіпсований запит: жоден хід не застосовано
+            statuses = [frame.status] * len(moves)
+        self.board.apply_bulk(moves, statuses)
+        if self.on_bulk:
+            self.on_bulk(moves, statuses)
+        self._handle_field(frame.status, self.board.cells)
 
     # ================= HANDLERS =================
     def _handle_field(self, status, field):
@@ -149,25 +252,26 @@ class UARTSudokuGame:
         elif status != STATUS_OK:
             self._emit_status(status)
 
-def _handle_status(self, status):
-    if status == STATUS_INVALID and self.on_invalid:
-        self.on_invalid()
-    elif status == STATUS_LOCKED and self.on_locked:
-        self.on_locked()
-    elif status == STATUS_WIN and self.on_win:
-        self.on_win()
-    elif status == STATUS_LOSE and self.on_lose:
-        self.on_lose()
-    else:
-        self._emit_status(status)
-
-def _emit_status(self, status):
-    if self.on_status:
-        self.on_status(STATUS_TEXT.get(status, "UNKNOWN"))
-
-# ================= CLOSE =================
-def close(self):
-    self.running = False
-    time.sleep(0.1)
-    if self.ser.is_open:
-        self.ser.close()
+    def _handle_status(self, status):
+        if status == STATUS_INVALID and self.on_invalid:
+            self.on_invalid()
+        elif status == STATUS_LOCKED and self.on_locked:
+            self.on_locked()
+        elif status == STATUS_WIN and self.on_win:
+            self.on_win()
+        elif status == STATUS_LOSE and self.on_lose:
+            self.on_lose()
+        else:
+            self._emit_status(status)
+
+    def _emit_status(self, status):
+        if self.on_status:
+            self.on_status(STATUS_TEXT.get(status, "UNKNOWN"))
+
+    # ================= CLOSE =================
+    def close(self):
+        self.running = False
+        serial_rx.wake(self.ser)
+        self.rx_thread.join(0.5)
+        if self.ser.is_open:
+            self.ser.close()
@@ -1,38 +1,38 @@
+import argparse
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 import serial
 import serial.tools.list_ports
 import threading
-import time
-from functools import reduce
-
-# ================= PROTOCOL CONSTANTS =================
-CMD_START = 0x01
-CMD_RESTART = 0x02
-CMD_GIVEUP = 0x03
-CMD_SET = 0x04
-CMD_CLEAR = 0x05
-CMD_FIELD = 0x07
-CMD_DIFFICULTY = 0x8
-CMD_HELP = 0x98
-CMD_CHEAT = 0x99
-
-CMD_NAMES = {
-    0x01: "START", 0x02: "RESTART", 0x03: "GIVEUP",
-    0x04: "SET", 0x05: "CLEAR", 0x07: "FIELD",
-    0x8: "DIFFICULTY", 0x98: "HELP", 0x99: "CHEAT"
-}
-
-STATUS_MAP = {
-    0x10: "OK", 0x11: "INVALID", 0x12: "LOCKED",
-    0x13: "CRC ERROR", 0x14: "YOU LOSE", 0x15: "YOU WIN",
-    0x16: "SETDIF", 0x65: "NOOB", 0x66: "OK_CHEAT"
-}
+
+import capture
+import journal
+import ringlog
+import serial_rx
+import solver
+from board import BoardModel
+from board_view import BOARDS
+from codec import (CMD_START, CMD_RESTART, CMD_GIVEUP, CMD_SET, CMD_CLEAR, CMD_FIELD,
+                   CMD_DIFFICULTY, CMD_VERSION, CMD_HELP, CMD_NAMES, STATUS_MAP, PROTOCOL_VERSION, SYNC,
+                   encode, encode_v2, request_cmd, split_requests,
+                   CMD_SYNC, DELTA_FLAG, NO_SEQ, STATUS_OK, STATUS_INVALID, STATUS_LOCKED, STATUS_DELTA,
+                   STATUS_FULL)
+from frame_parser import FrameParser
+from hotplug import PortWatcher
+from link_stats import LinkStats, StatsPanel
+from scheduler import CommandScheduler
+from ui_queue import UiEventQueue
 
 
 class SudokuGUI:
-    def __init__(self, root):
+    FIELD_REFRESH_MS = 100
+    HANDSHAKE_MS = 300
+
+    def __init__(self, root, renderer="label", capture_writer=None, log=None, session_journal=None):
         self.root = root
+        # Форматування й друк — у фоновому потоці, RX/TX лише кладуть кортежі в буфер
+        self.log = log or ringlog.RingLogger(ringlog.DEBUG).start()
         self.root.title("STM32 Sudoku Debug Mode")
         self.root.geometry("750x450")
         # Встановлюємо загальний фон вікна, щоб уникнути артефактів
@@ -40,172 +40,387 @@ class SudokuGUI:
 
         self.ser = None
         self.last_port = None
+        self.watcher = None         # PortWatcher: чекає повернення плати після відключення
         self.is_reconnecting = False
 
         self.overlay = None
         self.rx_running = True
+        self.capture = capture_writer   # capture.CaptureWriter: сирі TX/RX-байти сесії
+        self.replaying = False
+        self.stats = LinkStats()
+        self.stats_panel = None
+        # journal.Journal: поточна партія на диску; з нього UI відновлюється після реконекту чи перезапуску
+        self.journal = session_journal
+        self.level = None
+        self.verify_pending = False     # наступна відповідь на FIELD звіряє журнал з платою
+        self._handshake = None          # таймер очікування відповіді на CMD_VERSION
+        self.protocol = 1
 
         self.selected_cell = (0, 0)
-        self.cells = [[None] * 9 for _ in range(9)]
+        self.board = None
+        self.board_cls = BOARDS[renderer]
         self.initial_field = None
         self.initial_zeros_count = 0
+        # Локальна копія поля: ходи перевіряються одразу, без очікування відповіді плати
+        self.model = BoardModel()
+        # Чи можна ще дорішати поле — у фоновому потоці, результат через чергу подій
+        self.solvable = solver.SolvabilityCheck(
+            lambda gen, ok, ms: self.ui.post(self.on_solvable, gen, ok, ms, key="solvable"))
+        self._solve_gen = 0
+        self.dead_end = False       # останній хід залишив поле без розв'язку
         self.progress_var = tk.StringVar(value="Прогрес: 0%")
         self.game_started = False
 
+        # RX-потік не чіпає Tk напряму: події збираються в черзі, яку розбирає тік Tk
+        self.ui = UiEventQueue(self.root)
+        self.ui.start()
+
+        # Усі TX-кадри йдуть через планувальник: v1 — по одному на відповідь, v2 — пачками; FIELD не частіше за вікно
+        self.scheduler = CommandScheduler(self.write_batch, self.root.after, field_window_ms=self.FIELD_REFRESH_MS)
+
         self.status_bar = tk.Label(root, text="Очікування підключення...", relief=tk.SUNKEN, anchor="w")
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
+        # Обидва екрани будуються один раз і далі лише перемикаються
         self.create_menu()
+        self.create_game_ui()
+        self.show_menu()
+        if self.journal and self.journal.active:
+            self.status_bar.config(text=f"Знайдено незавершену партію (рівень {self.journal.session.level}) — "
+                                        f"підключіться, щоб продовжити", fg="#e67e22")
 
-    # ========== LOGGING & CHECKSUM ==========
-    def calculate_crc(self, data_list):
-        return reduce(lambda x, y: x ^ y, data_list) if data_list else 0
-
+    # ========== LOGGING ==========
     def log_tx(self, pkt):
-        cmd_name = CMD_NAMES.get(pkt[0], "UNKNOWN")
-        print(f"\033[94m[TX] SENDING {cmd_name}:\033[0m {pkt.hex(' ').upper()} | CRC: {hex(pkt[-1])}")
+        self.log.debug("\033[94m[TX] SENDING {0}:\033[0m {1:hex} | CRC: {2:#x}",
+                       CMD_NAMES.get(request_cmd(pkt), "UNKNOWN"), pkt,
+                       int.from_bytes(pkt[-2:], "big") if pkt[0] == SYNC else pkt[-1])
 
     def log_rx_packet(self, packet, is_long=False):
-        color = "\033[92m" if not is_long else "\033[96m"  # Зелений для коротких, бірюзовий для поля
-        p_type = "LONG (FIELD)" if is_long else "SHORT (STATUS)"
-        print(f"{color}[RX PACKET {p_type}]:\033[0m {bytes(packet).hex(' ').upper()}")
+        # packet — bytes: memoryview парсера до форматування вже буде перезаписано
+        if is_long:  # Зелений для коротких, бірюзовий для поля
+            self.log.debug("\033[96m[RX PACKET LONG (FIELD)]:\033[0m {0:hex}", packet)
+        else:
+            self.log.debug("\033[92m[RX PACKET SHORT (STATUS)]:\033[0m {0:hex}", packet)
 
     # ========== SERIAL CORE ==========
     def send_cmd(self, cmd, b1=0, b2=0, b3=0):
         # Додаткова перевірка перед відправкою
-        if self.is_reconnecting: return
+        if self.is_reconnecting or self.replaying: return
 
         if not self.ser or not self.ser.is_open:
             self.handle_disconnect()
             return
 
+        self.scheduler.send(cmd, b1, b2, b3)
+
+    def request_field(self):
+        self.scheduler.request_field()
+
+    def send_board_cmd(self, cmd, seq=None):
+        # START/RESTART: у v2 просимо дельту від останнього застосованого seq замість 84-байтового поля
+        if self.protocol < 2:
+            self.send_cmd(cmd)
+            return
+        if seq is None:
+            seq = NO_SEQ if self.model.seq is None else self.model.seq
+        self.send_cmd(cmd, seq >> 8, seq & 0xFF, DELTA_FLAG)
+
+    def negotiate(self):
+        # Рукостискання v2 після кожного (пере)підключення: новий парсер і кодер стартують з v1.
+        # Поки відповіді немає, інші команди чекають у черзі: відповідь на v1-запит,
+        # що прийшла б уже після перемикання парсера, загубилась би.
+        self.protocol = 1
+        self.scheduler.encode = encode
+        self.scheduler.window = 1
+        self.send_cmd(CMD_VERSION, PROTOCOL_VERSION)
+        self.scheduler.flush()
+        self.scheduler.pause()
+        # Стара прошивка мовчить: після тайм-ауту лишаємось на v1
+        self._handshake = self.root.after(self.HANDSHAKE_MS, self.on_protocol, 1)
+
+    def on_protocol(self, version):
+        if self._handshake:
+            self.root.after_cancel(self._handshake)
+            self._handshake = None
+        self.protocol = version
+        self.scheduler.encode = encode_v2 if version >= 2 else encode
+        # v2-прошивка розбирає потік за довжиною кадру: кілька запитів одним write
+        self.scheduler.window = None if version >= 2 else 1
+        self.scheduler.resume()
+        self.log.info("\033[93m[SYSTEM] Protocol v{0}\033[0m", version)
+
+    def write_batch(self, data):
+        if self.is_reconnecting or not self.ser or not self.ser.is_open:
+            return
         try:
-            payload = [cmd, b1, b2, b3]
-            crc = self.calculate_crc(payload)
-            pkt = bytes(payload + [crc])
-            self.ser.write(pkt)
-            self.log_tx(pkt)
+            self.ser.write(data)
+            self.stats.on_tx(data)
+            if self.capture:
+                self.capture.tx(data)
+            if self.log.level <= ringlog.DEBUG:
+                frames = 0
+                for pkt in split_requests(data):
+                    self.log_tx(pkt)
+                    frames += 1
+                self.log.debug("    \033[94m[TX BATCH]\033[0m {0} frame(s), saved so far: {1}",
+                               frames, self.scheduler.saved)
         except Exception as e:
-            print(f"\033[91m[ERROR TX]: {e}\033[0m")
+            self.log.error("\033[91m[ERROR TX]: {0}\033[0m", e)
             self.handle_disconnect()
 
     def rx_thread(self):
-        buffer = bytearray()
-        print("\033[93m[SYSTEM] Listening for STM32 data...\033[0m")
-
-        while self.rx_running and self.ser and self.ser.is_open:
-            try:
-                if self.ser.in_waiting > 0:
-                    chunk = self.ser.read(self.ser.in_waiting)
-                    buffer.extend(chunk)
-
-                    while len(buffer) >= 6:
-                        cmd_type = buffer[0]
-
-                        # Повне поле (84 байти)
-                        if cmd_type in [CMD_START, CMD_RESTART, CMD_CHEAT]:
-                            if len(buffer) < 84: break
-
-                            packet = list(buffer[:84])
-                            buffer = buffer[84:]
-                            self.log_rx_packet(packet, is_long=True)
-
-                            calc_crc = self.calculate_crc(packet[:83])
-                            if calc_crc == packet[83]:
-                                print(f"    \033[92m[CRC OK]\033[0m field received")
-                                print("=============================")
-                                self.root.after(0, self.update_field, packet[2:83], packet[1])
-                                self.root.after(100, lambda: self.send_cmd(CMD_FIELD))
-                            else:
-                                print(f"    \033[91m[CRC ERROR]\033[0m")
-
-                        # Коротка відповідь (6 байт)
-                        elif cmd_type in [CMD_SET, CMD_CLEAR, CMD_GIVEUP, CMD_FIELD, CMD_HELP, CMD_DIFFICULTY]:
-                            if len(buffer) < 6: break
-
-                            packet = list(buffer[:6])
-                            buffer = buffer[6:]
-                            self.log_rx_packet(packet, is_long=False)
-
-                            calc_crc = self.calculate_crc(packet[:5])
-                            if calc_crc == packet[5]:
-                                print(f"    \033[92m[CRC OK]\033[0m status: {STATUS_MAP.get(packet[1])}")
-                                print("=============================")
-                                status = packet[1]
-                                self.root.after(0, self.update_status_only, status)
-
-                                if cmd_type == CMD_SET:
-                                    if status == 0x10:
-                                        b1, b2, b3 = packet[2], packet[3], packet[4]
-                                        self.root.after(0, self.update_single_cell, b1, b2, b3)
-                                    if status == 0x11:
-                                        b1, b2 = packet[2], packet[3]
-                                        self.root.after(0, self.invalid, b1, b2)
-                                    if status == 0x12:
-                                        b1, b2, b3 = packet[2], packet[3], packet[4]
-                                        self.root.after(0, self.locked_cell, b1, b2, b3)
-                                    if status == 0x15:
-                                        self.root.after(0, self.mega_win)
-
-                                if cmd_type == 0x05:
-                                    b1, b2 = packet[2], packet[3]
-                                    if status == 0x10:
-                                        self.root.after(0, self.clear, b1, b2)
-                                    elif status == 0x12:
-                                        self.root.after(0, self.locked_cell, b1, b2, 0)
-
-                                if cmd_type == CMD_FIELD:
-                                    total = packet[2]
-                                    current = packet[3]
-                                    self.root.after(0, self.refresh_progress, total, current)
-
-                                if cmd_type == CMD_GIVEUP:
-                                    if status == 0x14:
-                                        self.root.after(0, self.give_up)
-
-                                if cmd_type == CMD_HELP:
-                                    b1, b2, b3 = packet[2], packet[3], packet[4]
-                                    if status == 0x65:
-                                        self.root.after(0, self.apply_hint_result, b1, b2, b3)
-                                    else:
-                                        self.root.after(0, self.locked_cell, b1, b2, 0)
-
-                                if cmd_type == CMD_DIFFICULTY:
-                                    if status == 0x16:
-                                        level = packet[2]
-                                        self.root.after(0, self.apply_difficulty_confirmed, level)
-                            else:
-                                print(f"    \033[91m[CRC ERROR]\033[0m")
-                time.sleep(0.01)
-            except Exception as e:
-                # Якщо виникла помилка читання (кабель висмикнули), викликаємо disconnect
-                print(f"RX Thread error (Connection Lost): {e}")
-                self.root.after(0, self.handle_disconnect)
-                break
+        ser = self.ser
+        self.log.info("\033[93m[SYSTEM] Listening for STM32 data...\033[0m")
+
+        parser = FrameParser()
+        self.stats.attach(parser)
+        try:
+            serial_rx.pump(ser, parser, self.handle_frame, lambda: self.rx_running, self.on_rx_data)
+        except Exception as e:
+            # Якщо виникла помилка читання (кабель висмикнули), викликаємо disconnect
+            if self.rx_running:
+                self.log.error("RX Thread error (Connection Lost): {0}", e)
+                self.ui.post(self.handle_disconnect)
+
+    def on_rx_data(self, chunk):
+        self.stats.on_rx(chunk)
+        if self.capture:
+            self.capture.rx(chunk)
+
+    def replay(self, path, speed=1.0):
+        # Відтворення запису замість порту: ті самі handle_frame -> черга -> Tk
+        self.replaying = True
+        self.journal = None     # записані ходи — не поточна партія
+        self.show_game()
+        self.game_started = True
+
+        def run():
+            records, frames, nbytes, dt = capture.replay(path, self.handle_frame, speed)
+            self.log.info("\033[93m[REPLAY]\033[0m {0} frames from {1} records in {2:.1f} ms",
+                          frames, records, dt * 1000)
+            self.ui.post(lambda: self.status_bar.config(text=f"STATUS: Відтворено {frames} кадрів", fg="black"))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def handle_frame(self, frame):
+        cmd_type = frame.cmd
+        self.stats.on_frame(frame)
+        log = self.log
+        if log.level <= ringlog.DEBUG:
+            self.log_rx_packet(bytes(frame.raw), is_long=frame.is_long)
+        if ringlog.TRACING:
+            log.trace("    [PARSER] cmd={0:#04x} status={1:#04x} len={2}", cmd_type, frame.status, len(frame.raw))
+
+        # Будь-яка відповідь (і зіпсована) звільняє місце для наступного запиту
+        self.ui.post(self.scheduler.reply)
+
+        if not frame.crc_ok:
+            log.warn("    \033[91m[CRC ERROR]\033[0m")
+            return
+
+        # Поле в протоколі v2: дельта або повне з номером зміни
+        if frame.status == STATUS_DELTA or frame.status == STATUS_FULL:
+            log.debug("    \033[92m[CRC OK]\033[0m {0} received\n=============================", STATUS_MAP[frame.status])
+            self.ui.post(self.apply_sync_frame, cmd_type, frame.status, bytes(frame.payload))
+            self.ui.post(self.request_field)
+            return
+
+        # Повне поле (84 байти)
+        if frame.is_long:
+            log.debug("    \033[92m[CRC OK]\033[0m field received\n=============================")
+            # Копія потрібна: memoryview парсера перезапишеться до виклику в Tk
+            self.ui.post(self.update_field, cmd_type, bytes(frame.payload), frame.status, key="field")
+            self.ui.post(self.request_field)
+            return
+
+        # Коротка відповідь (6 байт)
+        status = frame.status
+        b1, b2, b3 = frame.payload
+        log.debug("    \033[92m[CRC OK]\033[0m status: {0}\n=============================", STATUS_MAP.get(status))
+        self.ui.post(self.update_status_only, status, key="status")
+
+        if cmd_type == CMD_SET:
+            if status == 0x10:
+                self.ui.post(self.update_single_cell, b1, b2, b3)
+            if status == 0x11:
+                self.ui.post(self.rejected_cell, b1, b2)
+            if status == 0x12:
+                self.ui.post(self.locked_cell, b1, b2, b3, droppable=True)
+            if status == 0x15:
+                self.ui.post(self.mega_win)
+
+        if cmd_type == 0x05:
+            if status == 0x10:
+                self.ui.post(self.clear, b1, b2)
+            elif status == 0x12:
+                self.ui.post(self.locked_cell, b1, b2, 0, droppable=True)
+
+        if cmd_type == CMD_FIELD:
+            total = b1
+            current = b2
+            self.ui.post(self.refresh_progress, total, current, key="progress")
+
+        if cmd_type == CMD_GIVEUP:
+            if status == 0x14:
+                self.ui.post(self.give_up)
+
+        if cmd_type == CMD_HELP:
+            if status == 0x65:
+                self.ui.post(self.apply_hint_result, b1, b2, b3)
+            else:
+                self.ui.post(self.locked_cell, b1, b2, 0, droppable=True)
+
+        if cmd_type == CMD_VERSION and status == 0x10:
+            # Парсер уже перейшов на v2 сам; кодер і черга — у циклі Tk
+            self.ui.post(self.on_protocol, b1)
+
+        if cmd_type == CMD_DIFFICULTY:
+            if status == 0x16:
+                level = b1
+                self.ui.post(self.apply_difficulty_confirmed, level)
 
     # ========== GUI LOGIC ==========
-    def update_field(self, field_data, status):
+    def update_field(self, cmd, field_data, status):
         if self.game_started and self.initial_field is None:
             self.initial_field = list(field_data)
             self.initial_zeros_count = sum(1 for v in self.initial_field if v == 0)
 
+        # START і RESTART повертають початкове поле: з нього журнал починає партію наново.
+        # CHEAT теж приходить довгим кадром, але це розв'язок — журнал не чіпаємо
+        if self.game_started and self.journal and (cmd == CMD_START or cmd == CMD_RESTART):
+            self.journal.begin(self.level or 0, field_data)
+
+        # START/RESTART несуть початкове поле, CHEAT — розв'язок: обидва розв'язні
+        self.dead_end = False
+        self.render_field(field_data)
+        self.update_status_only(status)
+
+    def render_field(self, field_data):
+        initial = self.initial_field
+        self.model.load(field_data, initial)
+        cells = []
         for i in range(81):
             val = field_data[i]
-            r, c = i // 9, i % 9
-            color = "#2d3436" if self.initial_field and self.initial_field[i] != 0 else "#0984e3"
-            self.cells[r][c].config(text=str(val) if val != 0 else "", fg=color)
+            color = "#2d3436" if initial and initial[i] != 0 else "#0984e3"
+            cells.append((str(val) if val != 0 else "", color, None))
+        # Перемальовуються лише клітинки, що змінилися з минулого кадру
+        updated = self.board.render(cells)
+        self.log.debug("    \033[96m[RENDER]\033[0m {0}/81 cells updated", updated)
+
+    def restore_session(self):
+        # Поле з журналу малюється одразу; плата підтверджує його одним коротким FIELD
+        session = self.journal.session
+        self.show_game()
+        self.game_started = True
+        self.level = session.level
+        self.initial_field = list(session.initial)
+        self.initial_zeros_count = session.holes
+        self.render_field(session.cells)
+        self.status_bar.config(text=f"STATUS: Відновлено {session.moves} ходів з журналу, звіряємо з платою...",
+                               fg="#e67e22")
+        self.verify_pending = True
+        self.request_field()
+
+    def verify_session(self, holes, empty):
+        self.verify_pending = False
+        session = self.journal.session
+        if holes != session.holes:
+            # Плата перезапускалась: на ній інша партія (або жодної)
+            self.journal.end()
+            self.show_menu()
+            self.status_bar.config(text="STATUS: Плата не має збереженої партії — оберіть новий рівень", fg="red")
+        elif empty != session.empty:
+            # Відповідь на хід загубилась разом зі зв'язком: плата знає на кілька ходів більше чи менше.
+            # Рукостискання вже завершилось (FIELD чекав у черзі), тож версія протоколу відома.
+            self.status_bar.config(text=f"STATUS: Плата має {empty} порожніх клітинок, журнал — {session.empty}, "
+                                        f"синхронізуємо...", fg="#e67e22")
+            self.resync_session()
+        else:
+            self.status_bar.config(text="STATUS: Сесію відновлено й підтверджено платою", fg="green")
+
+    def resync_session(self):
+        if self.protocol >= 2:
+            # v2: плата віддає поточне поле, журнал підтягується до нього (apply_sync_frame)
+            self.send_cmd(CMD_SYNC, NO_SEQ >> 8, NO_SEQ & 0xFF)
+            return
+        # v1: поточного поля плати не отримати. RESTART повертає початкове поле,
+        # далі ходи з журналу йдуть звичайними SET — плата знову збігається з журналом
+        cells = bytes(self.journal.session.cells)
+        initial = self.journal.session.initial
+        self.send_cmd(CMD_RESTART)
+        for i in range(81):
+            if cells[i] and not initial[i]:
+                self.send_cmd(CMD_SET, i // 9, i % 9, cells[i])
+        self.request_field()
 
-        self.update_status_only(status)
+    def sync_journal(self, cells):
+        # Журнал = поле плати: дописуємо різницю звичайними записами ходів
+        session = self.journal.session
+        for i in range(81):
+            if session.cells[i] != cells[i]:
+                if cells[i]:
+                    self.journal.set(i // 9, i % 9, cells[i])
+                else:
+                    self.journal.clear(i // 9, i % 9)
+
+    def apply_sync_frame(self, cmd, status, payload):
+        if not self.model.apply_reply(cmd, status, payload):
+            # Дельта не від нашого seq (відповідь загубилась): просимо все поле
+            self.send_cmd(CMD_SYNC, NO_SEQ >> 8, NO_SEQ & 0xFF)
+            return
+        if cmd == CMD_SYNC:
+            # Поле після розсинхронізації — могло бути й після "тупикового" ходу
+            self.check_solvable()
+            if self.journal and self.journal.active:
+                self.sync_journal(self.model.cells)
+        else:
+            self.dead_end = False
+        if status == STATUS_FULL:
+            if cmd == CMD_START or cmd == CMD_RESTART:
+                self.update_field(cmd, payload[2:], STATUS_OK)
+            else:
+                self.render_field(payload[2:])
+                if cmd == CMD_SYNC and self.journal and self.journal.active:
+                    self.status_bar.config(text="STATUS: Журнал синхронізовано з платою", fg="green")
+                else:
+                    self.update_status_only(STATUS_OK)
+            return
+
+        # Дельта вже в моделі: перемальовуємо лише змінені клітинки
+        pairs = payload[4:]
+        for k in range(0, len(pairs), 2):
+            i, v = pairs[k], pairs[k + 1]
+            self.board.set(i // 9, i % 9, text=str(v) if v else "", fg="#0984e3")
+        self.log.debug("    \033[96m[DELTA]\033[0m {0} cell(s) updated", len(pairs) // 2)
+        if cmd == CMD_RESTART and self.journal and self.initial_field:
+            self.journal.begin(self.level or 0, self.initial_field)
+        self.update_status_only(STATUS_OK)
+
+    def check_solvable(self):
+        # Після кожного ходу (SET/CLEAR/HELP): поле гравця, а не початкове з довгого кадру
+        if self.game_started:
+            self._solve_gen = self.solvable.submit(self.model.cells)
+
+    def on_solvable(self, gen, solvable, ms):
+        if gen != self._solve_gen:
+            return      # поле вже змінилось, чекаємо новіший результат
+        self.log.debug("    \033[96m[SOLVER]\033[0m solvable: {0} ({1:.2f} ms)", solvable, ms)
+        self.dead_end = not solvable
+        if not solvable:
+            self.status_bar.config(text="STATUS: Поле більше не має розв'язку", fg="red")
 
     def apply_hint_result(self, r, c, val):
         if 0 <= r < 9 and 0 <= c < 9:
+            self.model.place(r, c, val)
+            if self.journal:
+                self.journal.help(r, c, val)
             display_text = str(val) if val != 0 else ""
-            self.cells[r][c].config(text=display_text, fg="#8e44ad")
-            original_bg = self.cells[r][c].cget("bg")
-            self.cells[r][c].config(bg="#fff9c4")
-            self.root.after(300, lambda: self.cells[r][c].config(bg=original_bg))
+            original_bg = self.board.bg(r, c)
+            self.board.set(r, c, text=display_text, fg="#8e44ad", bg="#fff9c4")
+            self.root.after(300, lambda: self.board.set(r, c, bg=original_bg))
             self.status_bar.config(text=f"STATUS: Використано підказку для ({r + 1}, {c + 1})", fg="#8e44ad")
-            self.send_cmd(CMD_FIELD)
+            self.request_field()
+            self.check_solvable()
 
     def apply_difficulty_confirmed(self, level):
         colors = {1: "#2ecc71", 2: "#f1c40f", 3: "#e74c3c"}
@@ -215,40 +430,59 @@ class SudokuGUI:
             else:
                 btn.config(font=("Arial", 20), fg="#bdc3c7")
         self.btn_start.config(state=tk.NORMAL, bg="#2ecc71")
+        self.level = level
         self.status_bar.config(text=f"STATUS: Рівень {level} підтверджено", fg="green")
 
     def update_single_cell(self, b1, b2, b3):
+        self.model.place(b1, b2, b3)
+        if self.journal:
+            self.journal.set(b1, b2, b3)
         display_text = str(b3)
-        self.cells[b1][b2].config(text=display_text, fg="#0984e3")
+        self.board.set(b1, b2, text=display_text, fg="#0984e3")
+        self.check_solvable()
 
     def clear(self, r, c):
-        self.cells[r][c].config(text="")
+        self.model.clear(r, c)
+        if self.journal:
+            self.journal.clear(r, c)
+        self.board.set(r, c, text="")
+        self.check_solvable()
+
+    def rejected_cell(self, r, c):
+        # Плата не прийняла хід, який ми вже намалювали: повертаємо її значення
+        if 0 <= r < 9 and 0 <= c < 9:
+            val = self.model.get(r, c)
+            self.board.set(r, c, text=str(val) if val else "")
+        self.invalid(r, c)
 
     def give_up(self):
+        if self.journal:
+            self.journal.end()
         messagebox.showinfo("Game Over", "Ви здалися! Повертаємось до головного меню.")
-        if hasattr(self, 'main_ui'):
-            self.main_ui.destroy()
-        self.game_started = False
-        self.initial_field = None
-        self.progress_var.set("Прогрес: 0%")
-        self.create_menu()
+        self.show_menu()
 
     def invalid(self, r, c):
-        self.cells[r][c].config(bg="#ffeaa7")
-        self.root.after(400, lambda: self.cells[r][c].config(bg="white"))
+        self.board.set(r, c, bg="#ffeaa7")
+        self.root.after(400, lambda: self.board.set(r, c, bg="white"))
 
     def update_status_only(self, status):
+        if status == 0x10 and self.dead_end:
+            # Попередження не перетирається звичайним "OK" від наступних відповідей
+            self.status_bar.config(text="STATUS: Поле більше не має розв'язку", fg="red")
+            return
         msg = STATUS_MAP.get(status, f"Code: {hex(status)}")
         color = "red" if status in [0x11, 0x12, 0x13] else "black"
         self.status_bar.config(text=f"STATUS: {msg}", fg=color)
 
     def locked_cell(self, r, c, val):
         if 0 <= r < 9 and 0 <= c < 9:
-            original_color = self.cells[r][c].cget("bg")
-            self.cells[r][c].config(bg="#ff7675")
-            self.root.after(500, lambda: self.cells[r][c].config(bg=original_color))
+            original_color = self.board.bg(r, c)
+            self.board.set(r, c, bg="#ff7675")
+            self.root.after(500, lambda: self.board.set(r, c, bg=original_color))
 
     def refresh_progress(self, total_zeros, current_zeros):
+        if self.verify_pending:
+            self.verify_session(total_zeros, current_zeros)
         if total_zeros == 0: return
         filled = total_zeros - current_zeros
         pct = int((filled / total_zeros) * 100)
@@ -257,6 +491,8 @@ class SudokuGUI:
         self.progressbar["value"] = pct
 
     def mega_win(self):
+        if self.journal:
+            self.journal.end()
         # Створення модального вікна перемоги
         win_window = tk.Toplevel(self.root)
         win_window.title("ПЕРЕМОГА! 🎉")
@@ -279,12 +515,7 @@ class SudokuGUI:
         # Функція для повного скидання гри та повернення в меню
         def reset_and_return():
             win_window.destroy()
-            if hasattr(self, 'main_ui'):
-                self.main_ui.destroy()
-            self.game_started = False
-            self.initial_field = None
-            self.progress_var.set("Прогрес: 0%")
-            self.create_menu()
+            self.show_menu()
             self.status_bar.config(text="Гру завершено. Оберіть новий рівень.", fg="black")
 
         # Кнопка тільки для виходу в меню (трохи збільшив її і зробив зеленою для краси)
@@ -297,20 +528,59 @@ class SudokuGUI:
         try:
             self.ser = serial.Serial(port, 115200, timeout=0.1)
             self.last_port = port
+            self.watcher = PortWatcher.for_port(port)
             self.btn_connect.config(state=tk.DISABLED, text="CONNECTED")
             for btn in self.diff_buttons:
                 btn.config(state=tk.NORMAL)
 
             self.rx_running = True
             threading.Thread(target=self.rx_thread, daemon=True).start()
-            print(f"\033[92m[CONNECTED]\033[0m to {port}")
+            self.log.info("\033[92m[CONNECTED]\033[0m to {0}", port)
+            self.negotiate()
+            if self.journal and self.journal.active:
+                self.restore_session()
 
         except Exception as e:
             messagebox.showerror("Port Error", str(e))
 
+    # ========== SCREENS ==========
+    def show_menu(self):
+        self.main_ui.pack_forget()
+        self.reset()
+        self.reset_menu()
+        self.menu_frame.pack(expand=True, fill="both")
+
+    def show_game(self):
+        self.menu_frame.pack_forget()
+        self.reset()
+        self.main_ui.pack(expand=True, fill="both", padx=20, pady=20)
+
+    def reset(self):
+        # Скидання ігрового екрана без перебудови віджетів
+        self.game_started = False
+        self.initial_field = None
+        self.initial_zeros_count = 0
+        self.model.load(bytes(81))
+        self.progress_var.set("Прогрес: 0%")
+        self.progressbar["value"] = 0
+        self.board.render([("", "#0984e3", "white")] * 81)
+        self.selected_cell = (0, 0)
+        self.select_cell(0, 0)
+
+    def reset_menu(self):
+        connected = bool(self.ser and self.ser.is_open)
+        self.btn_start.config(state=tk.DISABLED)
+        for btn in self.diff_buttons:
+            btn.config(font=("Arial", 20), fg="black", state=tk.NORMAL if connected else tk.DISABLED)
+        self.btn_connect.config(text="CONNECTED" if connected else "CONNECT",
+                                state=tk.DISABLED if connected else tk.NORMAL)
+
+    def refresh_ports(self):
+        # comports() лише коли користувач відкриває список, а не на кожну зміну екрана
+        self.port_combo["values"] = [p.device for p in serial.tools.list_ports.comports()]
+
     def create_menu(self):
         self.menu_frame = tk.Frame(self.root, bg="#f1f2f6")
-        self.menu_frame.pack(expand=True, fill="both")
 
         tk.Label(self.menu_frame, text="SUDOKU STM32", font=("Arial", 30, "bold"), bg="#f1f2f6").pack(pady=(50, 20))
 
@@ -325,38 +595,33 @@ class SudokuGUI:
 
         self.diff_buttons = []
         levels = [("🙂", 1), ("😐", 2), ("😡", 3)]
-        init_state = tk.NORMAL if self.ser and self.ser.is_open else tk.DISABLED
 
         for emoji, level in levels:
             btn = tk.Button(diff_frame, text=emoji, font=("Arial", 20), width=3, bd=0, cursor="hand2",
-                            state=init_state, command=lambda l=level: self.select_difficulty_request(l))
+                            state=tk.DISABLED, command=lambda l=level: self.select_difficulty_request(l))
             btn.pack(side=tk.LEFT, padx=10)
             self.diff_buttons.append(btn)
 
         tk.Frame(self.menu_frame, bg="#f1f2f6").pack(expand=True)  # Spacer
 
         tk.Label(self.menu_frame, text="Налаштування зв'язку:", font=("Arial", 10), bg="#f1f2f6").pack(pady=(10, 0))
-        ports = [p.device for p in serial.tools.list_ports.comports()]
-        self.port_combo = ttk.Combobox(self.menu_frame, values=ports, width=27)
-        if ports: self.port_combo.current(0)
+        self.port_combo = ttk.Combobox(self.menu_frame, width=27, postcommand=self.refresh_ports)
+        self.refresh_ports()
+        if self.port_combo["values"]: self.port_combo.current(0)
         self.port_combo.pack(pady=10)
 
-        conn_text = "CONNECTED" if self.ser and self.ser.is_open else "CONNECT"
-        conn_state = tk.DISABLED if self.ser and self.ser.is_open else tk.NORMAL
-        self.btn_connect = tk.Button(self.menu_frame, text=conn_text, state=conn_state, command=self.connect, width=20)
+        self.btn_connect = tk.Button(self.menu_frame, text="CONNECT", command=self.connect, width=20)
         self.btn_connect.pack(pady=(0, 50))
 
     def start_game(self):
+        self.show_game()
         self.game_started = True
-        self.menu_frame.destroy()
-        self.create_game_ui()
-        self.send_cmd(CMD_START)
-        self.root.after(300, lambda: self.send_cmd(CMD_FIELD))
+        self.send_board_cmd(CMD_START, NO_SEQ)
+        self.request_field()
 
     def create_game_ui(self):
         # задаємо колір фону явно, щоб не було синіх артефактів після реконекту
         self.main_ui = tk.Frame(self.root, bg="#f1f2f6")
-        self.main_ui.pack(expand=True, fill="both", padx=20, pady=20)
 
         side = tk.Frame(self.main_ui, bg="#f1f2f6")
         side.pack(side=tk.LEFT, padx=20)
@@ -373,7 +638,8 @@ class SudokuGUI:
                                                                                                    pady=2)
 
         tk.Button(side, text="CLEAR", bg="#fab1a0", command=self.clear_cell, width=15).pack(pady=20)
-        tk.Button(side, text="RESTART", command=lambda: self.send_cmd(CMD_RESTART)).pack(fill="x")
+        tk.Button(side, text="RESTART", command=lambda: self.send_board_cmd(CMD_RESTART)).pack(fill="x")
+        tk.Button(side, text="STATS", command=self.show_stats).pack(fill="x", pady=(5, 0))
         tk.Button(side, text="GIVE UP", bg="#e67e22", fg="white", font=("Arial", 10, "bold"),
                   command=self.give_up_action, width=15).pack(pady=(40, 10))
 
@@ -388,26 +654,33 @@ class SudokuGUI:
         grid_container = tk.Frame(right_panel, bg="#f1f2f6")
         grid_container.pack(expand=True)
 
-        grid = tk.Frame(self.main_ui, bg="#2c3e50", bd=2)
-        grid.pack()
+        self.board = self.board_cls(self.main_ui, self.select_cell)
+        self.board.pack()
 
-        for r in range(9):
-            for c in range(9):
-                lbl = tk.Label(grid, text="", width=2, height=1, font=("Arial", 20, "bold"), bg="white")
-                lbl.grid(row=r, column=c, padx=(1, 4 if (c + 1) % 3 == 0 else 1),
-                         pady=(1, 4 if (r + 1) % 3 == 0 else 1))
-                lbl.bind("<Button-1>", lambda e, row=r, col=c: self.select_cell(row, col))
-                self.cells[r][c] = lbl
-        self.select_cell(0, 0)
+    def show_stats(self):
+        if self.stats_panel and self.stats_panel.win.winfo_exists():
+            self.stats_panel.win.lift()
+            return
+        self.stats_panel = StatsPanel(self.root, self.stats)
 
     def select_cell(self, r, c):
-        self.cells[self.selected_cell[0]][self.selected_cell[1]].config(bg="white")
+        self.board.set(self.selected_cell[0], self.selected_cell[1], bg="white")
         self.selected_cell = (r, c)
-        self.cells[r][c].config(bg="#74b9ff")
+        self.board.set(r, c, bg="#74b9ff")
 
     def set_val(self, val):
-        self.send_cmd(CMD_SET, self.selected_cell[0], self.selected_cell[1], val)
-        self.root.after(100, lambda: self.send_cmd(CMD_FIELD))
+        r, c = self.selected_cell
+        status = self.model.check(r, c, val)
+        if status == STATUS_LOCKED:
+            self.locked_cell(r, c, val)
+            return
+        if status == STATUS_INVALID:
+            self.invalid(r, c)
+            return
+        # Хід коректний: малюємо одразу, плата лише підтверджує (або відкочує)
+        self.board.set(r, c, text=str(val), fg="#0984e3")
+        self.send_cmd(CMD_SET, r, c, val)
+        self.request_field()
 
     def select_difficulty_request(self, level):
         self.send_cmd(0x08, level, 0, 0)
@@ -421,20 +694,26 @@ class SudokuGUI:
     def give_up_action(self):
         if messagebox.askyesno("Здатися?", "Ви впевнені? Прогрес буде втрачено."):
             self.send_cmd(0x03)
-            self.root.after(200, lambda: self.send_cmd(CMD_FIELD))
+            self.request_field()
 
     def clear_cell(self):
-        self.send_cmd(CMD_CLEAR, self.selected_cell[0], self.selected_cell[1])
-        self.root.after(100, lambda: self.send_cmd(CMD_FIELD))
+        r, c = self.selected_cell
+        if self.model.is_given(r, c):
+            self.locked_cell(r, c, 0)
+            return
+        self.send_cmd(CMD_CLEAR, r, c)
+        self.request_field()
 
     def handle_disconnect(self):
         if self.is_reconnecting:
             return
 
-        print("\033[91m[DISCONNECTED FROM STM]\033[0m")
+        self.log.warn("\033[91m[DISCONNECTED FROM STM]\033[0m")
         self.is_reconnecting = True
         self.rx_running = False
+        self.scheduler.clear()
 
+        serial_rx.wake(self.ser)
         try:
             if self.ser:
                 self.ser.close()
@@ -454,22 +733,20 @@ class SudokuGUI:
         tk.Label(self.overlay, text=f"Очікування {self.last_port}...", fg="white", bg="#2c3e50").pack(pady=20)
 
     def reconnect_loop(self):
-        print("[SYSTEM] Searching STM...")
-        while self.is_reconnecting:
-            ports = [p.device for p in serial.tools.list_ports.comports()]
-            if self.last_port in ports:
-                try:
-                    self.ser = serial.Serial(self.last_port, 115200, timeout=0.1)
-                    print("[SYSTEM] STM reconnected!")
-                    self.is_reconnecting = False
-                    self.root.after(0, self.on_reconnect_success)
-                    return
-                except:
-                    pass
-            time.sleep(1)
+        self.log.info("[SYSTEM] Searching STM...")
+        # Прокидаємось на появу tty у /dev; плата шукається за серійником, тож новий номер ttyACM теж підійде
+        ser = self.watcher.wait(lambda: self.is_reconnecting,
+                                lambda path: serial.Serial(path, 115200, timeout=0.1))
+        if ser is None:
+            return
+        self.ser = ser
+        self.last_port = self.watcher.device
+        self.log.info("[SYSTEM] STM reconnected on {0}!", self.last_port)
+        self.is_reconnecting = False
+        self.ui.post(self.on_reconnect_success)
 
     def on_reconnect_success(self):
-        print("[SYSTEM] Restoring game session...")
+        self.log.info("[SYSTEM] Restoring game session...")
         if self.overlay:
             self.overlay.destroy()
             self.overlay = None
@@ -477,12 +754,57 @@ class SudokuGUI:
         self.status_bar.config(text="Зв'язок відновлено", fg="green")
         self.rx_running = True
         threading.Thread(target=self.rx_thread, daemon=True).start()
+        self.negotiate()
 
+        if self.game_started and self.journal and self.journal.active:
+            # Оптимістично намальовані, але не підтверджені ходи відкидаються: журнал має лише підтверджені
+            self.restore_session()
+            return
         # Запит актуального стану поля
-        self.root.after(300, lambda: self.send_cmd(CMD_FIELD))
+        self.request_field()
+
+
+def open_journal(path, log):
+    # Чужий чи зіпсований файл не повинен валити запуск GUI: відкладаємо його вбік
+    # (.bad) і починаємо новий журнал; якщо й це не вдалось — працюємо без журналу
+    try:
+        return journal.Journal(path)
+    except ValueError as e:
+        log.warn("\033[91m[JOURNAL]\033[0m {0}: moved aside to {1}.bad", e, path)
+        try:
+            os.replace(path, path + ".bad")
+            return journal.Journal(path)
+        except (OSError, ValueError) as e:
+            log.error("\033[91m[JOURNAL]\033[0m disabled: {0}", e)
+    except OSError as e:
+        log.error("\033[91m[JOURNAL]\033[0m disabled: {0}", e)
+    return None
 
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="STM32 Sudoku host GUI")
+    ap.add_argument("--renderer", choices=sorted(BOARDS), default="label", help="board widget implementation")
+    ap.add_argument("--capture", metavar="FILE", help="record raw UART traffic to FILE")
+    ap.add_argument("--replay", metavar="FILE", help="replay a capture instead of using a port")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay speed: 1 = real time, N = faster, 0 = max")
+    ap.add_argument("--log-level", choices=list(ringlog.LEVELS), default="debug",
+                    help="trace also needs SUDOKU_TRACE=1 in the environment")
+    ap.add_argument("--journal", metavar="FILE", default=os.path.expanduser("~/.stm32_sudoku.journal"),
+                    help="crash-safe journal of the current game (empty string disables it)")
+    args = ap.parse_args()
+
+    writer = capture.CaptureWriter(args.capture) if args.capture else None
+    log = ringlog.RingLogger(ringlog.LEVELS[args.log_level]).start()
+    session_journal = open_journal(args.journal, log) if args.journal and not args.replay else None
     root = tk.Tk()
-    app = SudokuGUI(root)
-    root.mainloop()
\ No newline at end of file
+    app = SudokuGUI(root, renderer=args.renderer, capture_writer=writer, log=log, session_journal=session_journal)
+    if args.replay:
+        app.replay(args.replay, args.speed)
+    try:
+        root.mainloop()
+    finally:
+        if writer:
+            writer.close()
+        if session_journal:
+            session_journal.close()
+        log.close()
\ No newline at end of file
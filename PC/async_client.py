@@ -0,0 +1,197 @@
+import asyncio
+import collections
+import os
+import threading
+
+import serial
+
+import codec
+import serial_rx
+from codec import (CMD_START, CMD_RESTART, CMD_GIVEUP, CMD_SET, CMD_CLEAR, CMD_FIELD,
+                   CMD_DIFFICULTY, CMD_HELP, CMD_CHEAT)
+from frame_parser import FrameParser
+
+# field заповнене лише для довгих кадрів (START/RESTART/CHEAT)
+Reply = collections.namedtuple("Reply", "cmd status b1 b2 b3 field")
+
+# Відповіді на ці команди несуть координати клітинки
+CELL_CMDS = (CMD_SET, CMD_CLEAR, CMD_HELP)
+
+
+class AsyncSudokuGame:
+    # Кожна команда повертає future, що завершується відповіддю саме на неї.
+    # window — скільки команд може бути "в польоті" одночасно. STM32 відповідає
+    # блокуючим HAL_UART_Transmit, і байти, що прийшли в цей час, губляться,
+    # тому для реальної плати лишаємо 1; емулятор витримує глибший конвеєр.
+
+    def __init__(self, ser, window=1, timeout=1.0):
+        self.ser = ser
+        self.timeout = timeout
+        self.loop = asyncio.get_running_loop()
+        self._window = asyncio.Semaphore(window)
+        self._pending = collections.defaultdict(collections.deque)  # cmd -> (b1, b2, future)
+        self._parser = FrameParser()
+        self._thread = None
+        self._thread_running = False
+
+        self.on_unsolicited = None  # def f(reply)
+
+        if os.name == "posix":
+            # POSIX: без потоків, цикл подій сам будить нас по готовності fd
+            ser.timeout = 0
+            self.loop.add_reader(ser.fileno(), self._on_readable)
+        else:
+            self._thread_running = True
+            self._thread = threading.Thread(target=self._rx_thread, daemon=True)
+            self._thread.start()
+
+    @classmethod
+    async def open(cls, port, baud=115200, **kw):
+        return cls(serial.Serial(port, baud, timeout=0), **kw)
+
+    # ================= COMMANDS =================
+    async def request(self, cmd, b1=0, b2=0, b3=0, timeout=None):
+        async with self._window:
+            fut = self.loop.create_future()
+            entry = (b1, b2, fut)
+            queue = self._pending[cmd]
+            queue.append(entry)
+            self.ser.write(codec.encode(cmd, b1, b2, b3))
+            try:
+                return await asyncio.wait_for(fut, timeout or self.timeout)
+            finally:
+                if not fut.done() or fut.cancelled():
+                    try:
+                        queue.remove(entry)
+                    except ValueError:
+                        pass
+
+    def start_game(self):
+        return self.request(CMD_START)
+
+    def restart_game(self):
+        return self.request(CMD_RESTART)
+
+    def give_up(self):
+        return self.request(CMD_GIVEUP)
+
+    def request_field(self):
+        return self.request(CMD_FIELD)
+
+    def select_difficulty(self, level):
+        return self.request(CMD_DIFFICULTY, level)
+
+    def set_cell(self, r, c, v):
+        return self.request(CMD_SET, r, c, v)
+
+    def clear_cell(self, r, c):
+        return self.request(CMD_CLEAR, r, c)
+
+    def help_cell(self, r, c):
+        return self.request(CMD_HELP, r, c)
+
+    def cheat(self):
+        return self.request(CMD_CHEAT)
+
+    async def close(self):
+        if self._thread is None:
+            self.loop.remove_reader(self.ser.fileno())
+        else:
+            self._thread_running = False
+            serial_rx.wake(self.ser)
+        for queue in self._pending.values():
+            for _, _, fut in queue:
+                fut.cancel()
+        self.ser.close()
+
+    # ================= RX =================
+    def _on_readable(self):
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except serial.SerialException as e:
+            self._fail(e)
+            return
+        for frame in self._parser.feed(data):
+            self._dispatch(frame)
+
+    def _rx_thread(self):
+        try:
+            serial_rx.pump(self.ser, self._parser, self._dispatch_threadsafe, lambda: self._thread_running)
+        except serial.SerialException as e:
+            self.loop.call_soon_threadsafe(self._fail, e)
+
+    def _dispatch_threadsafe(self, frame):
+        reply = self._to_reply(frame)
+        self.loop.call_soon_threadsafe(self._resolve, frame.crc_ok, reply)
+
+    def _dispatch(self, frame):
+        self._resolve(frame.crc_ok, self._to_reply(frame))
+
+    @staticmethod
+    def _to_reply(frame):
+        if frame.is_long:
+            return Reply(frame.cmd, frame.status, 0, 0, 0, bytes(frame.payload))
+        b1, b2, b3 = frame.payload
+        return Reply(frame.cmd, frame.status, b1, b2, b3, None)
+
+    def _resolve(self, crc_ok, reply):
+        if not crc_ok:
+            return      # зіпсований кадр: запит завершиться по тайм-ауту
+        queue = self._pending.get(reply.cmd)
+        while queue and queue[0][2].done():
+            queue.popleft()
+        if not queue:
+            if self.on_unsolicited:
+                self.on_unsolicited(reply)
+            return
+
+        # Той самий cmd і клітинка; інакше найстаріший запит (WIN -> 7,7,7, CHKERR -> 0,0,0)
+        entry = queue[0]
+        if reply.cmd in CELL_CMDS:
+            for e in queue:
+                if e[0] == reply.b1 and e[1] == reply.b2 and not e[2].done():
+                    entry = e
+                    break
+        queue.remove(entry)
+        entry[2].set_result(reply)
+
+    def _fail(self, exc):
+        for queue in self._pending.values():
+            for _, _, fut in queue:
+                if not fut.done():
+                    fut.set_exception(exc)
+            queue.clear()
+
+
+# ================= DEMO =================
+async def _demo(port, window, rounds=8):
+    # rounds разів: SET у всі порожні клітинки, потім CLEAR їх — 400 запитів на рівні 1
+    import time
+
+    game = await AsyncSudokuGame.open(port, window=window)
+    await game.select_difficulty(1)
+    start = await game.start_game()
+    empty = [i for i in range(81) if start.field[i] == 0]
+
+    n = 0
+    t = time.perf_counter()
+    for _ in range(rounds):
+        n += len(await asyncio.gather(*(game.set_cell(i // 9, i % 9, 1 + i % 9) for i in empty)))
+        n += len(await asyncio.gather(*(game.clear_cell(i // 9, i % 9) for i in empty)))
+    dt = time.perf_counter() - t
+    await game.close()
+    return n, dt
+
+
+if __name__ == "__main__":
+    # Конвеєр виграє лише там, де відповідь іде довше, ніж лінія нею зайнята:
+    # затримка USB-CDC (~1 мс) перекривається, а 87 мкс/байт — ні.
+    # На v1-прошивці (реальна плата) window > 1 губить запити, тож там конвеєр не допоможе.
+    from emulator import VirtualSerialDevice
+
+    for latency_ms in (0, 1):
+        with VirtualSerialDevice(seed=1, byte_delay=87e-6, latency=latency_ms / 1e3) as dev:
+            for w in (1, 4, 16):
+                n, dt = asyncio.run(_demo(dev.port, w))
+                print(f"link latency {latency_ms} ms, window={w:2d}: {n} replies in {dt * 1000:6.1f} ms "
+                      f"({n / dt:5.0f} cmd/s)")
@@ -0,0 +1,158 @@
+import itertools
+import time
+
+import numpy as np
+
+from solver import UNITS
+
+# ================= TABLES =================
+UNIT_IDX = np.array(UNITS, dtype=np.intp)      # (27, 9): рядки, стовпці, квадрати
+
+
+def _geometry():
+    # 72 перестановки клітинок: порядок смуг x порядок стеків x транспонування.
+    # Перестановки рядків усередині смуги сюди не входять.
+    perms = []
+    for transpose in (False, True):
+        for bands in itertools.permutations(range(3)):
+            for stacks in itertools.permutations(range(3)):
+                p = []
+                for r in range(9):
+                    R = bands[r // 3] * 3 + r % 3
+                    for c in range(9):
+                        C = stacks[c // 3] * 3 + c % 3
+                        p.append(C * 9 + R if transpose else R * 9 + C)
+                perms.append(p)
+    return np.array(perms, dtype=np.intp)
+
+
+GEOMETRY = _geometry()                          # (72, 81)
+
+# 81 цифра -> 5 чисел по 17 десяткових розрядів: лексикографічний порядок
+# рядка збігається з порядком цих ключів, а самі ключі — точний хеш поля
+_KEY_DIGITS = 17
+_KEY_WORDS = 5
+_POW10 = 10 ** np.arange(_KEY_DIGITS - 1, -1, -1, dtype=np.int64)
+
+
+# ================= VALIDATION =================
+def validate(boards, complete=False):
+    # boards — (N, 81) uint8, 0 = порожньо.
+    # -> (N,) bool: цифри в 0..9 і жодна ненульова не повторюється в рядку/стовпці/квадраті;
+    #    complete=True додатково вимагає, щоб порожніх клітинок не було
+    boards = np.asarray(boards, dtype=np.uint8)
+    ok = (boards <= 9).all(axis=1)
+    if complete:
+        ok &= (boards != 0).all(axis=1)
+    units = np.sort(boards[:, UNIT_IDX], axis=2)              # (N, 27, 9)
+    dup = (units[:, :, 1:] == units[:, :, :-1]) & (units[:, :, 1:] != 0)
+    ok &= ~dup.any(axis=(1, 2))
+    return ok
+
+
+# ================= CANONICAL FORM =================
+def _relabel(v):
+    # Цифри перейменовуються в порядку першої появи в рядку: (M, 81) -> (M, 81)
+    m = len(v)
+    rows = np.arange(m)
+    # Прохід справа наліво: для кожної цифри лишається позиція її першої появи
+    first = np.full((m, 10), 81, dtype=np.uint8)
+    for pos in range(80, -1, -1):
+        first[rows, v[:, pos]] = pos
+    order = np.argsort(first[:, 1:], axis=1, kind="stable")
+    lut = np.zeros((m, 10), dtype=np.uint8)
+    np.put_along_axis(lut, order + 1, np.arange(1, 10, dtype=np.uint8), axis=1)
+    return lut.ravel()[rows[:, None] * 10 + v]
+
+
+def keys(boards):
+    # (N, 81) -> (N, 5) int64; порівняння ключів = лексикографічне порівняння полів
+    boards = np.asarray(boards, dtype=np.int64)
+    padded = np.zeros((len(boards), _KEY_WORDS * _KEY_DIGITS), dtype=np.int64)
+    padded[:, :81] = boards
+    return padded.reshape(-1, _KEY_WORDS, _KEY_DIGITS) @ _POW10
+
+
+def canonicalize(boards, chunk=1024):
+    # Мінімальний (лексикографічно) представник серед 72 геометричних варіантів,
+    # кожен з цифрами, перейменованими за першою появою. -> (N, 81) uint8
+    boards = np.asarray(boards, dtype=np.uint8)
+    out = np.empty_like(boards)
+    n_var = len(GEOMETRY)
+    for start in range(0, len(boards), chunk):
+        part = boards[start:start + chunk]
+        n = len(part)
+        variants = _relabel(part[:, GEOMETRY].reshape(n * n_var, 81))
+        k = keys(variants).reshape(n, n_var, _KEY_WORDS)
+
+        # Відсіювання по словах ключа: лишаються варіанти з мінімумом у кожному слові
+        alive = np.ones((n, n_var), dtype=bool)
+        for w in range(_KEY_WORDS):
+            col = np.where(alive, k[:, :, w], np.iinfo(np.int64).max)
+            alive &= col == col.min(axis=1, keepdims=True)
+        best = alive.argmax(axis=1)
+        out[start:start + n] = variants.reshape(n, n_var, 81)[np.arange(n), best]
+    return out
+
+
+def dedupe(boards, chunk=1024):
+    # -> індекси першого входження кожного класу еквівалентності (у вхідному порядку)
+    k = np.ascontiguousarray(keys(canonicalize(boards, chunk)))
+    _, first = np.unique(k.view(np.dtype((np.void, k.dtype.itemsize * _KEY_WORDS))).ravel(),
+                         return_index=True)
+    return np.sort(first)
+
+
+# ================= BENCHMARK =================
+def _validate_loop(board):
+    # Один Python-прохід на поле, як rulle_game/c_zero
+    for unit in UNITS:
+        seen = 0
+        for i in unit:
+            v = board[i]
+            if v:
+                if seen >> v & 1:
+                    return False
+                seen |= 1 << v
+    return True
+
+
+def _bench(n=20000, seed=1):
+    import random
+    from emulator import METALON
+    from puzzle_pack import transform
+
+    rng = random.Random(seed)
+    base = [transform(METALON, rng) for _ in range(n // 4)]
+    boards = np.array([bytearray(base[rng.randrange(len(base))]) for _ in range(n)], dtype=np.uint8)
+    holes = np.random.default_rng(seed).random(boards.shape) < 0.5
+    boards[holes] = 0
+    boards[: n // 10] = boards[n // 10: n // 5]         # точні дублікати
+    # симетричні дублікати: випадковий геометричний варіант з перейменованими цифрами
+    k = n // 10
+    relabel = np.array([[0] + rng.sample(range(1, 10), 9) for _ in range(k)], dtype=np.uint8)
+    variant = GEOMETRY[np.array([rng.randrange(len(GEOMETRY)) for _ in range(k)])]
+    src = boards[2 * k: 3 * k]
+    boards[3 * k: 4 * k] = np.take_along_axis(relabel, np.take_along_axis(src, variant, axis=1), axis=1)
+    for i in range(0, n, 97):                           # частина полів зіпсована
+        boards[i, 0] = boards[i, 1] or 1
+
+    t = time.perf_counter()
+    ok_loop = [_validate_loop(b) for b in boards.tolist()]
+    loop = time.perf_counter() - t
+
+    t = time.perf_counter()
+    ok = validate(boards)
+    vec = time.perf_counter() - t
+    assert ok.tolist() == ok_loop
+
+    t = time.perf_counter()
+    unique = dedupe(boards)
+    canon = time.perf_counter() - t
+
+    print(f"validate : loop {n / loop:10.0f} boards/s   numpy {n / vec:10.0f} boards/s  ({loop / vec:.0f}x)")
+    print(f"canonical: {n / canon:10.0f} boards/s, {len(unique)}/{n} unique, {int((~ok).sum())} invalid")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,301 @@
+from codec import (CMD_START, CMD_SET, CMD_CLEAR, CMD_HELP, CMD_CHEAT, STATUS_OK, STATUS_INVALID, STATUS_LOCKED,
+                   STATUS_NOOB, STATUS_DELTA, STATUS_FULL, decode_seq)
+from solver import ROW, COL, BOX
+
+
+class BoardModel:
+    # Модель поля на боці ПК — дзеркало matall/matrix з прошивки.
+    # Замість обходу рядка, стовпця і блоку (rulle_game) тримаємо маски
+    # зайнятих цифр для кожного рядка/стовпця/блоку, тож перевірка ходу — O(1).
+    # HELP на платі ставить правильну цифру без перевірки, тому на полі можуть
+    # опинитися дублікати; лічильники дозволяють і тоді прибирати цифру за O(1).
+
+    __slots__ = ("cells", "givens", "rows", "cols", "boxes", "_counts", "seq")
+
+    def __init__(self, field=None, givens=None):
+        self.cells = bytearray(81)
+        self.givens = 0                     # біт i — клітинка i задана з початку (matrix)
+        self.rows = [0] * 9                 # біт d-1 — цифра d вже є в рядку
+        self.cols = [0] * 9
+        self.boxes = [0] * 9
+        self._counts = bytearray(27 * 10)   # [блок * 10 + цифра], блоки: рядки, стовпці, квадрати
+        self.seq = None                     # останній застосований seq плати (None — невідомий)
+        if field is not None:
+            self.load(field, givens)
+
+    def load(self, field, givens=None):
+        # field — 81 значення; givens — початкове поле (за замовчуванням — ненульові клітинки field)
+        if givens is None:
+            givens = field
+        mask = 0
+        for i in range(81):
+            if givens[i]:
+                mask |= 1 << i
+        self.givens = mask
+        self.refill(field)
+
+    def refill(self, field):
+        # Нові значення клітинок при тих самих заданих (наприклад, відповідь на CHEAT)
+        self.cells[:] = bytes(81)
+        self.rows[:] = [0] * 9
+        self.cols[:] = [0] * 9
+        self.boxes[:] = [0] * 9
+        self._counts[:] = bytes(270)
+        for i in range(81):
+            if field[i]:
+                self._add(i, field[i])
+
+    # ================= QUERIES =================
+    def get(self, r, c):
+        return self.cells[r * 9 + c]
+
+    def is_given(self, r, c):
+        return (self.givens >> (r * 9 + c)) & 1 == 1
+
+    def candidates(self, r, c):
+        # -> маска цифр, які можна поставити в клітинку (біт d-1 — цифра d)
+        i = r * 9 + c
+        if self.cells[i]:
+            return 0
+        return 0x1FF & ~(self.rows[ROW[i]] | self.cols[COL[i]] | self.boxes[BOX[i]])
+
+    @property
+    def empty(self):
+        return self.cells.count(0)
+
+    def check(self, r, c, v):
+        # Те саме рішення, що й прошивка: OK / INVALID / LOCKED, без зміни стану
+        if not (0 <= r < 9 and 0 <= c < 9):
+            return STATUS_INVALID
+        i = r * 9 + c
+        if (self.givens >> i) & 1:
+            return STATUS_LOCKED
+        if not 1 <= v <= 9:
+            return STATUS_INVALID
+        bit = 1 << (v - 1)
+        if not (self.rows[ROW[i]] | self.cols[COL[i]] | self.boxes[BOX[i]]) & bit:
+            return STATUS_OK
+        if self.cells[i] != v:
+            return STATUS_INVALID
+        # Та сама цифра вже стоїть тут: конфлікт, лише якщо вона є ще деінде в блоці
+        counts = self._counts
+        if counts[ROW[i] * 10 + v] > 1 or counts[(9 + COL[i]) * 10 + v] > 1 or counts[(18 + BOX[i]) * 10 + v] > 1:
+            return STATUS_INVALID
+        return STATUS_OK
+
+    # ================= MOVES =================
+    def set(self, r, c, v):
+        # Хід гравця: застосовується лише якщо check() == OK
+        status = self.check(r, c, v)
+        if status == STATUS_OK:
+            self.place(r, c, v)
+        return status
+
+    def place(self, r, c, v):
+        # Безумовний запис (підтверджений платою SET або підказка HELP)
+        i = r * 9 + c
+        if self.cells[i]:
+            self._remove(i, self.cells[i])
+        if v:
+            self._add(i, v)
+
+    def clear(self, r, c):
+        i = r * 9 + c
+        if (self.givens >> i) & 1:
+            return STATUS_LOCKED
+        if self.cells[i]:
+            self._remove(i, self.cells[i])
+        return STATUS_OK
+
+    def apply_reply(self, cmd, status, payload):
+        # Оновлення з відповіді плати. Довгий кадр: START/RESTART несуть початкове
+        # поле, CHEAT — розв'язок при тих самих заданих. Короткий: SET/CLEAR/HELP.
+        # -> False лише для дельти, що не стикується з нашим seq: треба просити FULL
+        if status == STATUS_DELTA or status == STATUS_FULL:
+            return self.apply_sync(cmd, status, payload)
+        if len(payload) == 81:
+            self.seq = None
+            if cmd == CMD_CHEAT:
+                self.refill(payload)
+            else:
+                self.load(payload)
+            return True
+        b1, b2, b3 = payload
+        if b1 > 8 or b2 > 8:
+            return True
+        if cmd == CMD_SET and status == STATUS_OK:
+            self.place(b1, b2, b3)
+        elif cmd == CMD_CLEAR and status == STATUS_OK:
+            self.clear(b1, b2)
+        elif cmd == CMD_HELP and status == STATUS_NOOB:
+            self.place(b1, b2, b3)
+        return True
+
+    def apply_bulk(self, moves, statuses):
+        # Відповідь на CMD_BULKSET несе лише статуси: самі ходи хост пам'ятає з запиту
+        for (r, c, v), status in zip(moves, statuses):
+            if status == STATUS_OK:
+                self.place(r, c, v)
+
+    def apply_sync(self, cmd, status, payload):
+        # Кадри DELTA/FULL (протокол v2). FULL на START — нова партія, інакше задані ті самі
+        seq, rest = decode_seq(payload)
+        if status == STATUS_FULL:
+            if cmd == CMD_START:
+                self.load(rest)
+            else:
+                self.refill(rest)
+            self.seq = seq
+            return True
+        base, rest = decode_seq(rest)
+        if base != self.seq:
+            return False
+        cells = self.cells
+        for k in range(0, len(rest), 2):
+            i = rest[k]
+            v = rest[k + 1]
+            if cells[i]:
+                self._remove(i, cells[i])
+            if v:
+                self._add(i, v)
+        self.seq = seq
+        return True
+
+    def _add(self, i, v):
+        self.cells[i] = v
+        bit = 1 << (v - 1)
+        counts = self._counts
+        counts[ROW[i] * 10 + v] += 1
+        counts[(9 + COL[i]) * 10 + v] += 1
+        counts[(18 + BOX[i]) * 10 + v] += 1
+        self.rows[ROW[i]] |= bit
+        self.cols[COL[i]] |= bit
+        self.boxes[BOX[i]] |= bit
+
+    def _remove(self, i, v):
+        self.cells[i] = 0
+        bit = 1 << (v - 1)
+        counts = self._counts
+        k = ROW[i] * 10 + v
+        counts[k] -= 1
+        if not counts[k]:
+            self.rows[ROW[i]] &= ~bit
+        k = (9 + COL[i]) * 10 + v
+        counts[k] -= 1
+        if not counts[k]:
+            self.cols[COL[i]] &= ~bit
+        k = (18 + BOX[i]) * 10 + v
+        counts[k] -= 1
+        if not counts[k]:
+            self.boxes[BOX[i]] &= ~bit
+
+
+# ================= BENCHMARK =================
+def _record(path, protocol, games, seed=1):
+    # Сценарій гри прямо на FirmwareEmulator (без pty), трафік пишеться в capture-файл:
+    # DIFFICULTY, START, ходи з FIELD після кожного, RESTART, ходи, HELP, RESTART, ходи, CHEAT
+    import codec
+    import capture
+    import solver
+    from emulator import FirmwareEmulator
+
+    fw = FirmwareEmulator(seed, version=protocol)
+    model = BoardModel()
+    encode = codec.encode_v2 if protocol == 2 else codec.encode
+
+    with capture.CaptureWriter(path) as cap:
+        def send(cmd, b1=0, b2=0, b3=0, enc=None):
+            pkt = (enc or encode)(cmd, b1, b2, b3)
+            cap.tx(pkt)
+            n, reply = fw.take(bytearray(pkt))
+            if reply:
+                cap.rx(reply)
+                frame = (_frame_v2 if reply[0] == codec.SYNC else _frame_v1)(reply)
+                model.apply_reply(frame[0], frame[1], frame[2])
+
+        def board_cmd(cmd, seq=None):
+            if protocol < 2:
+                send(cmd)
+                return
+            seq = (codec.NO_SEQ if model.seq is None else model.seq) if seq is None else seq
+            send(cmd, seq >> 8, seq & 0xFF, codec.DELTA_FLAG)
+
+        def play(moves):
+            solution = solver.solve(model.cells)
+            for i in [i for i in range(81) if not model.cells[i]][:moves]:
+                send(codec.CMD_SET, i // 9, i % 9, solution[i])
+                send(codec.CMD_FIELD)
+
+        if protocol == 2:
+            send(codec.CMD_VERSION, 2, enc=codec.encode)
+        for _ in range(games):
+            send(codec.CMD_DIFFICULTY, 2)
+            board_cmd(codec.CMD_START, codec.NO_SEQ)
+            play(10)
+            board_cmd(codec.CMD_RESTART)
+            play(15)
+            empty = [i for i in range(81) if not model.cells[i]]
+            send(codec.CMD_HELP, empty[0] // 9, empty[0] % 9)
+            board_cmd(codec.CMD_RESTART)
+            play(model.cells.count(0) - 5)
+            board_cmd(codec.CMD_CHEAT)
+
+
+def _frame_v1(pkt):
+    return pkt[0], pkt[1], pkt[2:-1]
+
+
+def _frame_v2(pkt):
+    return pkt[2], pkt[3], pkt[4:-2]
+
+
+def _replay(path):
+    # -> {назва команди: [кадрів полів, байтів, секунд на розбір і застосування]}
+    import time
+    import capture
+    from codec import CMD_NAMES
+    from frame_parser import FrameParser
+
+    parser = FrameParser()
+    model = BoardModel()
+    per_cmd = {}
+    for _, direction, data in capture.read(path):
+        if direction != capture.RX:
+            continue
+        t = time.perf_counter()
+        for frame in parser.feed(data):
+            model.apply_reply(frame.cmd, frame.status, frame.payload)
+            if len(frame.payload) > 3:
+                # Кожна відповідь записана окремо: час запису — час цього кадру
+                row = per_cmd.setdefault(CMD_NAMES[frame.cmd], [0, 0, 0.0])
+                row[0] += 1
+                row[1] += len(frame.raw)
+                row[2] += time.perf_counter() - t
+    return per_cmd
+
+
+def _bench(games=200):
+    import os
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as d:
+        results = {}
+        for protocol in (1, 2):
+            path = os.path.join(d, f"v{protocol}.cap")
+            _record(path, protocol, games)
+            results[protocol] = _replay(path)
+
+    print(f"{games} recorded games, board frames only")
+    totals = {}
+    for protocol, per_cmd in results.items():
+        label = "v1 full" if protocol == 1 else "v2 delta"
+        for name, (n, nbytes, spent) in sorted(per_cmd.items()):
+            print(f"  {label:8s} {name:8s}: {n:4d} frames {nbytes / n:5.1f} B/frame  parse+apply {spent / n * 1e6:6.1f} us")
+        totals[protocol] = (sum(r[1] for r in per_cmd.values()), sum(r[2] for r in per_cmd.values()))
+    (b1, s1), (b2, s2) = totals[1], totals[2]
+    print(f"  total: {b1} -> {b2} B ({100 - b2 * 100 / b1:.0f}% less), host time {s1 * 1e3:.1f} -> {s2 * 1e3:.1f} ms "
+          f"({100 - s2 * 100 / s1:.0f}% less)")
+
+
+if __name__ == "__main__":
+    _bench()
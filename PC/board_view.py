@@ -0,0 +1,229 @@
+import bisect
+import time
+import tkinter as tk
+
+TEXT, FG, BG = 0, 1, 2
+
+
+class _ShadowBoard:
+    # Тіньова копія того, що вже намальовано (текст, колір цифри, фон).
+    # Нащадки звертаються до Tk лише для клітинок, чий вигляд справді змінився.
+
+    def __init__(self, fg, bg):
+        self._shadow = [["", fg, bg] for _ in range(81)]
+        self.updates = 0        # усього оновлених клітинок
+        self.frame_updates = 0  # за останній render()
+
+    def text(self, r, c):
+        return self._shadow[r * 9 + c][TEXT]
+
+    def fg(self, r, c):
+        return self._shadow[r * 9 + c][FG]
+
+    def bg(self, r, c):
+        return self._shadow[r * 9 + c][BG]
+
+    def render(self, cells):
+        # cells — 81 кортеж (text, fg, bg), None = не чіпати; -> кількість оновлених клітинок
+        before = self.updates
+        set_ = self.set
+        for i in range(81):
+            text, fg, bg = cells[i]
+            set_(i // 9, i % 9, text, fg, bg)
+        self.frame_updates = self.updates - before
+        return self.frame_updates
+
+
+class LabelBoard(_ShadowBoard):
+    # Поле 9x9 з tk.Label: кожен .config() — окремий виклик Tcl.
+
+    def __init__(self, parent, on_click, font=("Arial", 20, "bold"), fg="black", bg="white", edge_pad=True):
+        super().__init__(fg, bg)
+        self.frame = tk.Frame(parent, bg="#2c3e50", bd=2)
+        self.cells = [[None] * 9 for _ in range(9)]
+
+        for r in range(9):
+            for c in range(9):
+                lbl = tk.Label(self.frame, text="", width=2, height=1, font=font, fg=fg, bg=bg)
+                px = 4 if (c + 1) % 3 == 0 and (edge_pad or c < 8) else 1
+                py = 4 if (r + 1) % 3 == 0 and (edge_pad or r < 8) else 1
+                lbl.grid(row=r, column=c, padx=(1, px), pady=(1, py))
+                lbl.bind("<Button-1>", lambda e, row=r, col=c: on_click(row, col))
+                self.cells[r][c] = lbl
+
+    def pack(self, **kw):
+        self.frame.pack(**kw)
+
+    def set(self, r, c, text=None, fg=None, bg=None):
+        # Повертає True, якщо віджет довелося оновити
+        state = self._shadow[r * 9 + c]
+        changes = {}
+        if text is not None and text != state[TEXT]:
+            state[TEXT] = changes["text"] = text
+        if fg is not None and fg != state[FG]:
+            state[FG] = changes["fg"] = fg
+        if bg is not None and bg != state[BG]:
+            state[BG] = changes["bg"] = bg
+        if not changes:
+            return False
+        self.cells[r][c].config(**changes)
+        self.updates += 1
+        return True
+
+
+class CanvasBoard(_ShadowBoard):
+    # Те саме поле на одному tk.Canvas: 81 прямокутник + 81 текст, один обробник кліку.
+    # Інтерфейс збігається з LabelBoard, тож спалахи (invalid/locked/підказка)
+    # стають простими itemconfig.
+
+    def __init__(self, parent, on_click, font=("Arial", 20, "bold"), fg="black", bg="white", edge_pad=True,
+                 cell=40):
+        super().__init__(fg, bg)
+        self._on_click = on_click
+
+        # Відступи як у LabelBoard: 1 px між клітинками, 4 px між блоками 3x3
+        self._pos = []
+        x = 3
+        for i in range(9):
+            self._pos.append(x)
+            x += cell + (4 if (i + 1) % 3 == 0 and (edge_pad or i < 8) else 1)
+        size = x + 2
+
+        self.frame = self.canvas = tk.Canvas(parent, width=size, height=size, bg="#2c3e50",
+                                             highlightthickness=0)
+        self._rects = []
+        self._texts = []
+        half = cell // 2
+        for r in range(9):
+            y = self._pos[r]
+            for c in range(9):
+                x = self._pos[c]
+                self._rects.append(self.canvas.create_rectangle(x, y, x + cell, y + cell, fill=bg, width=0))
+                self._texts.append(self.canvas.create_text(x + half, y + half, text="", fill=fg, font=font))
+        self._cell = cell
+        self.canvas.bind("<Button-1>", self._click)
+
+    def _click(self, event):
+        r = bisect.bisect_right(self._pos, event.y) - 1
+        c = bisect.bisect_right(self._pos, event.x) - 1
+        if 0 <= r < 9 and 0 <= c < 9 and event.x < self._pos[c] + self._cell and event.y < self._pos[r] + self._cell:
+            self._on_click(r, c)
+
+    def pack(self, **kw):
+        self.canvas.pack(**kw)
+
+    def set(self, r, c, text=None, fg=None, bg=None):
+        i = r * 9 + c
+        state = self._shadow[i]
+        changed = False
+        if bg is not None and bg != state[BG]:
+            state[BG] = bg
+            self.canvas.itemconfigure(self._rects[i], fill=bg)
+            changed = True
+        changes = {}
+        if text is not None and text != state[TEXT]:
+            state[TEXT] = changes["text"] = text
+        if fg is not None and fg != state[FG]:
+            state[FG] = changes["fill"] = fg
+        if changes:
+            self.canvas.itemconfigure(self._texts[i], **changes)
+            changed = True
+        if changed:
+            self.updates += 1
+        return changed
+
+
+BOARDS = {"label": LabelBoard, "canvas": CanvasBoard}
+
+
+# ================= BENCHMARK =================
+class _CountingTk:
+    # Обгортка інтерпретатора Tk: рахує виклики Tcl. Дочірні віджети копіюють
+    # master.tk, тож підміни на root достатньо для всього дерева.
+
+    def __init__(self, tk_app):
+        self._tk = tk_app
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+        return self._tk.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
+
+
+def _bench(frames=200):
+    import random
+
+    rnd = random.Random(1)
+    boards = [[(str(rnd.randrange(1, 10)) if rnd.random() < 0.6 else "", rnd.choice(("#2d3436", "#0984e3")), None)
+               for _ in range(81)] for _ in range(frames)]
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"board_view benchmark needs a display (desktop or xvfb-run): {e}")
+    counter = root.tk = _CountingTk(root.tk)
+    for name, cls in BOARDS.items():
+        host = tk.Frame(root)
+        host.pack()
+        counter.calls = 0
+        t = time.perf_counter()
+        board = cls(host, lambda r, c: None)
+        board.pack()
+        root.update()
+        build = time.perf_counter() - t
+        build_calls = counter.calls
+
+        counter.calls = 0
+        t = time.perf_counter()
+        for cells in boards:
+            board.render(cells)
+            root.update_idletasks()
+        redraw = (time.perf_counter() - t) / frames
+        redraw_calls = counter.calls / frames
+
+        counter.calls = 0
+        t = time.perf_counter()
+        for i in range(frames):
+            board.set(i % 9, (i // 9) % 9, bg="#ff7675" if i % 2 else "white")
+            root.update_idletasks()
+        flash = (time.perf_counter() - t) / frames
+        flash_calls = counter.calls / frames
+
+        host.destroy()
+        print(f"{name:6s}: build {build * 1000:7.2f} ms ({build_calls} Tcl calls)  "
+              f"full redraw {redraw * 1000:6.3f} ms/frame ({redraw_calls:.0f} calls)  "
+              f"flash {flash * 1000:6.3f} ms ({flash_calls:.0f} calls)")
+
+    # Ігровий екран повністю (create_game_ui + show_game): саме це бачить гравець
+    import ringlog
+    from Sudoky import SudokuGUI
+
+    log = ringlog.RingLogger(ringlog.ERROR).start()
+    for name in BOARDS:
+        window = tk.Toplevel(root)
+        app = SudokuGUI(window, renderer=name, log=log)
+        best, calls = None, 0
+        for _ in range(5):
+            app.main_ui.destroy()
+            root.update()
+            counter.calls = 0
+            t = time.perf_counter()
+            app.create_game_ui()
+            app.show_game()
+            root.update()
+            spent = time.perf_counter() - t
+            if best is None or spent < best:
+                best, calls = spent, counter.calls
+        app.ui.stop()
+        app.solvable.close()
+        window.destroy()
+        print(f"{name:6s}: game screen {best * 1000:7.2f} ms ({calls} Tcl calls, best of 5)")
+    log.close()
+    root.destroy()
+
+
+if __name__ == "__main__":
+    _bench()
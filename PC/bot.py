@@ -0,0 +1,170 @@
+import argparse
+import collections
+import queue
+import threading
+import time
+
+import solver
+from codec import CMD_SET, CMD_BULKSET, CMD_DIFFICULTY, STATUS_OK, STATUS_WIN, STATUS_SETDIF
+from Prot_com import UARTSudokuGame
+
+
+class GameFailed(Exception):
+    pass
+
+
+class SudokuBot:
+    # Грає повні партії через UARTSudokuGame: рівень -> START -> локальний
+    # розв'язок -> потік SET до STATUS_WIN.
+    # window — скільки SET може бути "в польоті"; реальна плата губить байти,
+    # поки передає відповідь, тож для неї лише 1.
+    # bulk — усі ходи одним CMD_BULKSET (протокол v2) замість потоку SET.
+
+    def __init__(self, port, level=1, window=1, timeout=1.0, bulk=False):
+        self.level = level
+        self.window = window
+        self.bulk = bulk
+        self.timeout = timeout
+        self._events = queue.Queue()
+
+        self.game = UARTSudokuGame(port)
+        self.game.on_reply = lambda *reply: self._events.put(reply)
+        self.game.on_field = lambda matrix: self._events.put(None)
+        self.game.on_bulk = lambda moves, statuses: self._events.put((CMD_BULKSET, statuses))
+
+        self.games = 0
+        self.moves = 0
+        self.latencies = []     # мкс від SET (чи BULKSET) до відповіді на нього
+
+    def _wait(self, cmd=None):
+        # -> наступна коротка відповідь з cmd (або None для кадру поля)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                event = self._events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise GameFailed(f"no reply to {'field' if cmd is None else hex(cmd)}")
+            if cmd is None and event is None:
+                return None
+            if event is not None and event[0] == cmd:
+                return event
+
+    def play(self):
+        game = self.game
+        game.select_difficulty(self.level)
+        if self._wait(CMD_DIFFICULTY)[1] != STATUS_SETDIF:
+            raise GameFailed("difficulty rejected")
+        game.start_game()
+        self._wait()
+
+        # Прошивка приймає будь-яке коректне заповнення, не обов'язково "своє"
+        solution = solver.solve(game.board.cells)
+        if solution is None:
+            raise GameFailed("board has no solution")
+        moves = [(i // 9, i % 9, solution[i]) for i in range(81) if not game.board.cells[i]]
+        if self.bulk and game.version >= 2:
+            self._play_bulk(moves)
+            return
+
+        inflight = collections.deque()
+        k = 0
+        while k < len(moves) or inflight:
+            while k < len(moves) and len(inflight) < self.window:
+                r, c, v = moves[k]
+                k += 1
+                inflight.append(time.perf_counter())
+                if game.set_cell(r, c, v) != STATUS_OK:
+                    raise GameFailed(f"move ({r}, {c}) = {v} rejected locally")
+            _, status, _, _, _ = self._wait(CMD_SET)
+            self.latencies.append((time.perf_counter() - inflight.popleft()) * 1e6)
+            self.moves += 1
+            if status == STATUS_WIN:
+                self.games += 1
+                return
+            if status != STATUS_OK:
+                raise GameFailed(f"SET answered with status {status:#04x}")
+        raise GameFailed("board full but no WIN")
+
+    def _play_bulk(self, moves):
+        t = time.perf_counter()
+        self.game.set_cells(moves)
+        _, statuses = self._wait(CMD_BULKSET)
+        self.latencies.append((time.perf_counter() - t) * 1e6)
+        self.moves += len(moves)
+        if any(status != STATUS_OK for status in statuses):
+            raise GameFailed(f"{sum(status != STATUS_OK for status in statuses)} bulk move(s) rejected")
+        if self.game.board.empty:
+            raise GameFailed("board full but no WIN")
+        self.games += 1
+
+    def close(self):
+        self.game.close()
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def run(ports, games, level=1, window=1, bulk=False):
+    # Один бот на порт, усі паралельно, кожен грає games партій поспіль
+    bots = [SudokuBot(port, level, window, bulk=bulk) for port in ports]
+    failures = []
+
+    def worker(bot):
+        for _ in range(games):
+            try:
+                bot.play()
+            except GameFailed as e:
+                failures.append(f"{bot.game.ser.port}: {e}")
+
+    threads = [threading.Thread(target=worker, args=(bot,)) for bot in bots]
+    t = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    dt = time.perf_counter() - t
+
+    lat = sorted(x for bot in bots for x in bot.latencies)
+    won = sum(bot.games for bot in bots)
+    moves = sum(bot.moves for bot in bots)
+    for bot in bots:
+        bot.close()
+
+    print(f"[BOT] {len(bots)} board(s), {won}/{len(bots) * games} games won in {dt:.2f} s: "
+          f"{won / dt * 60:.0f} games/min, {moves / dt:.0f} moves/s")
+    print(f"      {'BULKSET' if bulk else 'SET'} latency p50 {_percentile(lat, 50) / 1000:.2f} ms  p90 {_percentile(lat, 90) / 1000:.2f} ms  "
+          f"p99 {_percentile(lat, 99) / 1000:.2f} ms  max {(lat[-1] if lat else 0) / 1000:.2f} ms")
+    for f in failures:
+        print(f"      FAILED {f}")
+    return won, failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Headless bot: plays full Sudoku games over the UART protocol")
+    ap.add_argument("--port", action="append", default=[], help="serial port (repeat for several boards)")
+    ap.add_argument("--emulate", type=int, default=1, help="number of emulated boards when no --port is given")
+    ap.add_argument("--byte-delay-us", type=float, default=87.0, help="emulator line delay per byte")
+    ap.add_argument("-g", "--games", type=int, default=10, help="games per board, back to back")
+    ap.add_argument("-l", "--level", type=int, choices=(1, 2, 3), default=2)
+    ap.add_argument("-w", "--window", type=int, default=1, help="SET commands in flight (1 for real boards)")
+    ap.add_argument("--bulk", action="store_true", help="fill the board with one BULKSET frame (protocol v2)")
+    args = ap.parse_args()
+
+    if args.port:
+        run(args.port, args.games, args.level, args.window, args.bulk)
+        return
+
+    from emulator import VirtualSerialDevice
+    devices = [VirtualSerialDevice(seed=i, byte_delay=args.byte_delay_us / 1e6).start() for i in range(args.emulate)]
+    try:
+        run([dev.port for dev in devices], args.games, args.level, args.window, args.bulk)
+    finally:
+        for dev in devices:
+            dev.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import struct
+import threading
+import time
+
+from codec import CMD_NAMES, request_cmd
+from frame_parser import FrameParser
+
+# ================= FORMAT =================
+# Заголовок, далі записи: час від початку запису (monotonic, нс), напрям, довжина, байти.
+MAGIC = b"SDKP"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHQ")    # magic, version, резерв, початок запису (time.time_ns)
+RECORD = struct.Struct("<QBH")      # t_ns, напрям, довжина
+
+TX, RX = 0, 1
+
+
+class CaptureWriter:
+    # Пише з будь-якого потоку (TX — цикл Tk, RX — потік прийому).
+    # Буфер файлу скидає записи на диск великими блоками, а не на кожен пакет.
+
+    def __init__(self, path, buffer_size=1 << 16):
+        self.path = path
+        self._f = open(path, "wb", buffering=buffer_size)
+        self._f.write(HEADER.pack(MAGIC, VERSION, 0, time.time_ns()))
+        self._t0 = time.monotonic_ns()
+        self._lock = threading.Lock()
+        self.records = 0
+        self.bytes = 0
+
+    def write(self, direction, data):
+        t = time.monotonic_ns() - self._t0
+        with self._lock:
+            if self._f is None:
+                return
+            self._f.write(RECORD.pack(t, direction, len(data)))
+            self._f.write(data)
+            self.records += 1
+            self.bytes += len(data)
+
+    def tx(self, data):
+        self.write(TX, data)
+
+    def rx(self, data):
+        self.write(RX, data)
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read(path):
+    # -> генератор (t_ns, напрям, bytes)
+    with open(path, "rb") as f:
+        magic, version, _, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a session capture (v{VERSION})")
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            t, direction, length = RECORD.unpack(head)
+            data = f.read(length)
+            if len(data) < length:
+                return      # запис обірвано (наприклад, процес убито)
+            yield t, direction, data
+
+
+# ================= REPLAY =================
+def replay(path, on_frame, speed=1.0, on_tx=None, parser=None):
+    # RX-байти з запису йдуть у FrameParser, кадри — в on_frame, як з реального порту.
+    # speed: 1 — реальний темп, N — у N разів швидше, 0 — без пауз.
+    # -> (записів, кадрів, байтів, секунд)
+    parser = parser or FrameParser()
+    records = frames = nbytes = 0
+    start = time.perf_counter()
+    for t, direction, data in read(path):
+        if speed:
+            delay = t / 1e9 / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        records += 1
+        nbytes += len(data)
+        if direction == TX:
+            if on_tx:
+                on_tx(data)
+            continue
+        for frame in parser.feed(data):
+            on_frame(frame)
+            frames += 1
+    return records, frames, nbytes, time.perf_counter() - start
+
+
+def _dump(path):
+    # RX-шматки не вирівняні по кадрах, тож назву команди показуємо лише для TX
+    for t, direction, data in read(path):
+        if direction == TX:
+            print(f"{t / 1e6:10.3f} ms  TX  {CMD_NAMES.get(request_cmd(data), '?'):10s} {data.hex(' ').upper()}")
+        else:
+            print(f"{t / 1e6:10.3f} ms  RX  {'':10s} {data.hex(' ').upper()}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or replay a UART session capture")
+    ap.add_argument("capture")
+    ap.add_argument("--dump", action="store_true", help="print records instead of replaying")
+    ap.add_argument("--speed", type=float, default=0, help="1 = real time, N = N times faster, 0 = max")
+    args = ap.parse_args()
+
+    if args.dump:
+        _dump(args.capture)
+        return
+
+    # Без GUI: лише парсер — пропускна здатність розбору на реальному трафіку
+    records, frames, nbytes, dt = replay(args.capture, lambda frame: None, args.speed)
+    print(f"[REPLAY] {records} records, {frames} frames, {nbytes} bytes in {dt * 1000:.1f} ms "
+          f"({frames / dt if dt else 0:.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+import binascii
+import struct
+
+# ================= CMD =================
+CMD_START      = 0x01
+CMD_RESTART    = 0x02
+CMD_GIVEUP     = 0x03
+CMD_SET        = 0x04
+CMD_CLEAR      = 0x05
+CMD_CLEARALL   = 0x06
+CMD_FIELD      = 0x07
+CMD_DIFFICULTY = 0x08
+CMD_VERSION    = 0x09
+CMD_SYNC       = 0x0A
+CMD_BULKSET    = 0x0B
+CMD_HELP       = 0x98
+CMD_CHEAT      = 0x99
+
+# ================= STATUS =================
+STATUS_OK       = 0x10
+STATUS_INVALID  = 0x11
+STATUS_LOCKED   = 0x12
+STATUS_CHKERR   = 0x13
+STATUS_LOSE     = 0x14
+STATUS_WIN      = 0x15
+STATUS_SETDIF   = 0x16
+STATUS_DELTA    = 0x17
+STATUS_FULL     = 0x18
+STATUS_NOOB     = 0x65
+STATUS_OK_CHEAT = 0x66
+
+CMD_NAMES = {
+    0x01: "START", 0x02: "RESTART", 0x03: "GIVEUP",
+    0x04: "SET", 0x05: "CLEAR", 0x06: "CLEARALL", 0x07: "FIELD",
+    0x08: "DIFFICULTY", 0x09: "VERSION", 0x0A: "SYNC",
+    0x0B: "BULKSET", 0x98: "HELP", 0x99: "CHEAT"
+}
+
+STATUS_MAP = {
+    0x10: "OK", 0x11: "INVALID", 0x12: "LOCKED",
+    0x13: "CRC ERROR", 0x14: "YOU LOSE", 0x15: "YOU WIN",
+    0x16: "SETDIF", 0x17: "DELTA", 0x18: "FULL", 0x65: "NOOB", 0x66: "OK_CHEAT"
+}
+
+# ================= FRAME LAYOUT =================
+# PC -> STM32: [cmd, b1, b2, b3, xor]
+# STM32 -> PC: [cmd, status, b1, b2, b3, xor] або [cmd, status, 81 клітинка, xor]
+REQUEST_FRAME = 5
+SHORT_FRAME = 6
+LONG_FRAME = 84
+
+LONG_CMDS = (CMD_START, CMD_RESTART, CMD_CHEAT)
+SHORT_CMDS = (CMD_GIVEUP, CMD_SET, CMD_CLEAR, CMD_FIELD, CMD_DIFFICULTY, CMD_VERSION, CMD_HELP)
+
+# cmd -> довжина відповіді, 0 = невідомий байт
+FRAME_SIZE = bytearray(256)
+for _cmd in LONG_CMDS:
+    FRAME_SIZE[_cmd] = LONG_FRAME
+for _cmd in SHORT_CMDS:
+    FRAME_SIZE[_cmd] = SHORT_FRAME
+
+_REQUEST = struct.Struct("5B")
+_SHORT = struct.Struct("6B")
+_LONG_HEAD = struct.Struct("2B")
+
+
+# ================= CHECKSUM =================
+_WORDS = {}
+
+
+def xor_fold(data):
+    # XOR усіх байтів: struct розбирає буфер на 64-бітні слова, потім 64 -> 8 біт
+    n = len(data)
+    words = _WORDS.get(n)
+    if words is None:
+        words = _WORDS[n] = struct.Struct("<%dQ%dB" % (n >> 3, n & 7))
+    x = 0
+    for w in words.unpack(data):
+        x ^= w
+    x ^= x >> 32
+    x ^= x >> 16
+    x ^= x >> 8
+    return x & 0xFF
+
+
+# ================= ENCODE =================
+# Готові пакети для команд без аргументів
+PACKETS = {cmd: _REQUEST.pack(cmd, 0, 0, 0, cmd) for cmd in (CMD_START, CMD_RESTART, CMD_GIVEUP, CMD_FIELD)}
+
+
+def encode(cmd, b1=0, b2=0, b3=0):
+    if not (b1 or b2 or b3):
+        pkt = PACKETS.get(cmd)
+        if pkt is not None:
+            return pkt
+    return _REQUEST.pack(cmd, b1, b2, b3, cmd ^ b1 ^ b2 ^ b3)
+
+
+def encode_short(cmd, status, b1=0, b2=0, b3=0):
+    return _SHORT.pack(cmd, status, b1, b2, b3, cmd ^ status ^ b1 ^ b2 ^ b3)
+
+
+def encode_field(cmd, status, field):
+    pkt = bytearray(LONG_FRAME)
+    _LONG_HEAD.pack_into(pkt, 0, cmd, status)
+    pkt[2:83] = field
+    pkt[83] = xor_fold(memoryview(pkt)[:83])
+    return bytes(pkt)
+
+
+# ================= DECODE =================
+def decode_request(pkt):
+    # -> (cmd, b1, b2, b3, crc_ok)
+    cmd, b1, b2, b3, chk = _REQUEST.unpack_from(pkt)
+    return cmd, b1, b2, b3, chk == cmd ^ b1 ^ b2 ^ b3
+
+
+def decode_short(pkt):
+    # -> (cmd, status, b1, b2, b3, crc_ok)
+    cmd, status, b1, b2, b3, chk = _SHORT.unpack_from(pkt)
+    return cmd, status, b1, b2, b3, chk == cmd ^ status ^ b1 ^ b2 ^ b3
+
+
+def decode_field(pkt):
+    # -> (cmd, status, field, crc_ok); field — memoryview без копіювання
+    mv = memoryview(pkt)
+    cmd, status = _LONG_HEAD.unpack_from(mv)
+    return cmd, status, mv[2:83], xor_fold(mv[:83]) == mv[83]
+
+
+# ================= PROTOCOL V2 =================
+# [SYNC, LEN, тіло з LEN байтів, CRC16 старшим байтом уперед]; CRC рахується по LEN і тілу.
+# Запит: тіло [cmd, b1, b2, b3]; відповідь: [cmd, status, дані...].
+# v1 лишається за замовчуванням. Рукостискання — v1-запит [CMD_VERSION, 2, 0, 0]:
+# прошивка з v2 відповідає коротким v1-кадром [CMD_VERSION, OK, версія, 0, 0],
+# стара прошивка невідому команду мовчки ігнорує — тайм-аут означає v1.
+# Прошивка з v2 приймає обидва формати й відповідає у форматі запиту
+# (cmd v1 ніколи не дорівнює SYNC).
+SYNC = 0xA5
+PROTOCOL_VERSION = 2
+
+V2_OVERHEAD = 4                                 # SYNC + LEN + CRC16
+REQUEST_FRAME_V2 = 4 + V2_OVERHEAD              # 8
+SHORT_FRAME_V2 = 5 + V2_OVERHEAD                # 9
+LONG_FRAME_V2 = 2 + 81 + V2_OVERHEAD            # 87
+MAX_BODY = 255
+
+_V2_HEAD = struct.Struct(">BB")
+_V2_CRC = struct.Struct(">H")
+
+
+def _crc16_table(poly=0x1021):
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly if crc & 0x8000 else crc << 1) & 0xFFFF
+        table.append(crc)
+    return tuple(table)
+
+
+CRC16_TABLE = _crc16_table()
+
+
+def crc16_table(data, crc=0xFFFF):
+    # CRC-16/CCITT-FALSE по таблиці — так само рахує прошивка
+    table = CRC16_TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ b]
+    return crc
+
+
+def crc16(data):
+    # Те саме значення, але цикл у C (binascii.crc_hqx — той самий поліном 0x1021)
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def pack_v2(body):
+    n = len(body)
+    if not 0 < n <= MAX_BODY:
+        raise ValueError(f"v2 body must be 1..{MAX_BODY} bytes, got {n}")
+    pkt = bytearray(n + V2_OVERHEAD)
+    _V2_HEAD.pack_into(pkt, 0, SYNC, n)
+    pkt[2:2 + n] = body
+    _V2_CRC.pack_into(pkt, 2 + n, crc16(memoryview(pkt)[1:2 + n]))
+    return bytes(pkt)
+
+
+def encode_v2(cmd, b1=0, b2=0, b3=0):
+    return pack_v2(bytes((cmd, b1, b2, b3)))
+
+
+def encode_short_v2(cmd, status, b1=0, b2=0, b3=0):
+    return pack_v2(bytes((cmd, status, b1, b2, b3)))
+
+
+def encode_field_v2(cmd, status, field):
+    return pack_v2(bytes((cmd, status)) + bytes(field))
+
+
+def decode_v2(pkt, crc=crc16):
+    # -> (тіло, crc_ok); pkt — рівно один кадр
+    mv = memoryview(pkt)
+    n = mv[1]
+    return mv[2:2 + n], crc(mv[1:2 + n]) == _V2_CRC.unpack_from(mv, 2 + n)[0]
+
+
+# ================= DELTA FIELD (V2) =================
+# Прошивка нумерує кожну зміну matall (seq, 16 біт) і пам'ятає останні зміни.
+# START/RESTART/CHEAT з b3 = DELTA_FLAG і b1:b2 = останній seq хоста, а також
+# CMD_SYNC [seq_hi, seq_lo] отримують замість 84-байтового поля:
+#   DELTA: [cmd, STATUS_DELTA, seq(2), base(2), (клітинка, значення) * n] — зміни після base
+#   FULL:  [cmd, STATUS_FULL, seq(2), 81 клітинка] — коли журнал змін не покриває base
+#          або дельта не коротша за поле
+# Хост застосовує дельту лише якщо base збігається з його seq, інакше просить FULL (NO_SEQ).
+DELTA_FLAG = 0x01
+NO_SEQ = 0xFFFF
+
+_SEQ = struct.Struct(">H")
+_DELTA_HEAD = struct.Struct(">BBHH")
+_FULL_HEAD = struct.Struct(">BBH")
+
+
+def encode_delta_v2(cmd, seq, base, pairs):
+    # pairs — (індекс клітинки 0..80, значення)
+    body = bytearray(_DELTA_HEAD.pack(cmd, STATUS_DELTA, seq, base))
+    for cell, value in pairs:
+        body += bytes((cell, value))
+    return pack_v2(body)
+
+
+def encode_full_v2(cmd, seq, field):
+    return pack_v2(_FULL_HEAD.pack(cmd, STATUS_FULL, seq) + bytes(field))
+
+
+def decode_seq(payload):
+    # payload кадру DELTA/FULL (після cmd і status) -> (seq, решта)
+    return _SEQ.unpack_from(payload)[0], payload[2:]
+
+
+# ================= BULK SET (V2) =================
+# Багато ходів одним кадром: [CMD_BULKSET, n, (клітинка, значення) * n], клітинка = r * 9 + c.
+# Прошивка застосовує ходи по черзі, як n окремих CMD_SET, і відповідає одним кадром
+#   [CMD_BULKSET, OK або WIN, n, бітова карта]
+# де на кожен хід 2 біти (молодші біти першого байта — перший хід): BULK_OK / BULK_INVALID / BULK_LOCKED.
+# У v1 команди немає: 5-байтовий запит не вміщує ходів.
+BULK_OK, BULK_INVALID, BULK_LOCKED = 0, 1, 2
+BULK_STATUS = (STATUS_OK, STATUS_INVALID, STATUS_LOCKED)
+MAX_BULK = (MAX_BODY - 2) // 2                  # 126: ціле поле вміщується в один кадр
+
+
+def encode_bulk_v2(moves):
+    # moves — (r, c, v)
+    n = len(moves)
+    if not 0 < n <= MAX_BULK:
+        raise ValueError(f"bulk set takes 1..{MAX_BULK} moves, got {n}")
+    body = bytearray((CMD_BULKSET, n))
+    for r, c, v in moves:
+        body += bytes((r * 9 + c, v))
+    return pack_v2(body)
+
+
+def pack_bulk_result(codes):
+    # [BULK_*] -> бітова карта, 4 ходи на байт
+    out = bytearray((len(codes) + 3) // 4)
+    for k, code in enumerate(codes):
+        out[k >> 2] |= code << ((k & 3) * 2)
+    return bytes(out)
+
+
+def encode_bulk_reply_v2(status, codes):
+    return pack_v2(bytes((CMD_BULKSET, status, len(codes))) + pack_bulk_result(codes))
+
+
+def decode_bulk(payload):
+    # payload відповіді (після cmd і status) -> [STATUS_OK / STATUS_INVALID / STATUS_LOCKED] на кожен хід
+    n = payload[0]
+    bitmap = payload[1:]
+    return [BULK_STATUS[(bitmap[k >> 2] >> ((k & 3) * 2)) & 3] for k in range(n)]
+
+
+def split_requests(data):
+    # Пачка TX-байтів (v1 і/або v2) -> окремі кадри запитів
+    i = 0
+    while i < len(data):
+        size = data[i + 1] + V2_OVERHEAD if data[i] == SYNC else REQUEST_FRAME
+        yield data[i:i + size]
+        i += size
+
+
+def request_cmd(pkt):
+    return pkt[2] if pkt[0] == SYNC else pkt[0]
+
+
+# ================= BENCHMARK =================
+def _bench(n=200000):
+    import timeit
+    from functools import reduce
+
+    field = bytes(i % 10 for i in range(81))
+    short = encode_short(CMD_SET, STATUS_OK, 1, 2, 3)
+    long_ = encode_field(CMD_START, STATUS_OK, field)
+
+    def old_encode():
+        payload = [CMD_FIELD, 0, 0, 0]
+        return bytes(payload + [reduce(lambda x, y: x ^ y, payload)])
+
+    def old_decode_long():
+        packet = list(long_)
+        return reduce(lambda x, y: x ^ y, packet[:83]) == packet[83]
+
+    def loop_xor():
+        c = 0
+        for b in long_[:83]:
+            c ^= b
+        return c
+
+    cases = (
+        ("encode FIELD (old reduce)", old_encode),
+        ("encode FIELD (cached)", lambda: encode(CMD_FIELD)),
+        ("encode SET", lambda: encode(CMD_SET, 1, 2, 3)),
+        ("decode short", lambda: decode_short(short)),
+        ("decode long (old reduce)", old_decode_long),
+        ("decode long", lambda: decode_field(long_)),
+        ("xor 83 B (python loop)", loop_xor),
+        ("xor 83 B (word fold)", lambda: xor_fold(long_[:83])),
+    )
+    long2 = encode_field_v2(CMD_START, STATUS_OK, field)
+    body = long2[1:-2]
+    assert crc16(body) == crc16_table(body)
+    cases += (
+        ("crc16 85 B (table, python)", lambda: crc16_table(body)),
+        ("crc16 85 B (crc_hqx)", lambda: crc16(body)),
+        ("encode SET v2", lambda: encode_v2(CMD_SET, 1, 2, 3)),
+        ("decode long v2", lambda: decode_v2(long2)),
+    )
+    for name, fn in cases:
+        t = min(timeit.repeat(fn, number=n, repeat=3))
+        print(f"{name:28s}: {t / n * 1e9:8.0f} ns/packet")
+
+    # Що бачать контрольні суми: перестановка сусідніх байтів і подвоєний байт
+    missed = {"xor": 0, "crc16": 0}
+    trials = 0
+    for i in range(2, 82):
+        for bad in (long_[:i] + long_[i + 1:i + 2] + long_[i:i + 1] + long_[i + 2:],
+                    long_[:i] + long_[i:i + 1] + long_[i:83]):
+            if bad[:83] == long_[:83]:
+                continue
+            trials += 1
+            missed["xor"] += xor_fold(bad[:83]) == long_[83]
+            missed["crc16"] += crc16(bad[1:83]) == crc16(long_[1:83])
+    print(f"swapped/doubled bytes undetected of {trials}: xor {missed['xor']}, crc16 {missed['crc16']}")
+
+
+if __name__ == "__main__":
+    _bench()
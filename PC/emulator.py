@@ -0,0 +1,446 @@
+import argparse
+import collections
+import os
+import random
+import selectors
+import threading
+import time
+import tty
+
+import codec
+from codec import (CMD_START, CMD_RESTART, CMD_GIVEUP, CMD_SET, CMD_CLEAR, CMD_FIELD,
+                   CMD_DIFFICULTY, CMD_VERSION, CMD_HELP, CMD_CHEAT, REQUEST_FRAME, CMD_NAMES, SYNC,
+                   V2_OVERHEAD, PROTOCOL_VERSION, CMD_SYNC, CMD_BULKSET, DELTA_FLAG, NO_SEQ,
+                   BULK_OK, BULK_INVALID, BULK_LOCKED,
+                   STATUS_OK, STATUS_INVALID, STATUS_LOCKED, STATUS_CHKERR, STATUS_LOSE,
+                   STATUS_WIN, STATUS_SETDIF, STATUS_NOOB, STATUS_OK_CHEAT)
+
+METALON = bytes([
+    1, 2, 3, 4, 5, 6, 7, 8, 9,
+    4, 5, 6, 7, 8, 9, 1, 2, 3,
+    7, 8, 9, 1, 2, 3, 4, 5, 6,
+
+    2, 3, 1, 5, 6, 4, 8, 9, 7,
+    5, 6, 4, 8, 9, 7, 2, 3, 1,
+    8, 9, 7, 2, 3, 1, 5, 6, 4,
+
+    3, 1, 2, 6, 4, 5, 9, 7, 8,
+    6, 4, 5, 9, 7, 8, 3, 1, 2,
+    9, 7, 8, 3, 1, 2, 6, 4, 5,
+])
+
+HOLES = {1: 25, 2: 45, 3: 65}
+LEVELS = {holes: level for level, holes in HOLES.items()}
+
+
+# ================= FIRMWARE =================
+class FirmwareEmulator:
+    # Python-копія обробки команд з STM/SUDOKU/Core/Src/main.c.
+    # Матриці зберігаються пласко (81 байт), індекс = r * 9 + c.
+    # Кожна зміна matall нумерується (seq) і потрапляє в журнал останніх змін —
+    # з нього будуються дельта-кадри (див. codec, DELTA FIELD).
+    CHANGE_LOG = 64
+
+    def __init__(self, seed=None, db=None, version=PROTOCOL_VERSION):
+        self.rng = random.Random(seed)
+        self.version = version          # 1 — стара прошивка: CMD_VERSION невідома, лише 5-байтові запити
+        self.framing = 1                # формат поточного запиту: у ньому ж іде відповідь
+        self.db = db                    # puzzle_db.PuzzleDB: задачі з єдиним розв'язком замість generate_sudoku
+        self.matall = bytearray(81)     # поточне поле гравця
+        self.matCHEAT = bytearray(81)   # розв'язок
+        self.matrix = bytearray(81)     # початкові цифри
+
+        self.seq = 0                    # номер останньої зміни matall
+        self._changes = collections.deque(maxlen=self.CHANGE_LOG)     # (seq, клітинка)
+        self._base = 0                  # дельта можлива лише від seq >= _base
+        self._since = None              # seq хоста з поточного запиту, якщо він просить дельту
+
+    def handle(self, request):
+        # HAL_UART_RxCpltCallback: 5 байтів запиту -> байти відповіді (або b"")
+        self.framing = 1
+        self._since = None
+        cmd, b1, b2, b3, crc_ok = codec.decode_request(request)
+        if not crc_ok:
+            return self.send_response(cmd, STATUS_CHKERR, 0, 0, 0)
+        return self.process_command(cmd, b1, b2, b3)
+
+    def take(self, buf):
+        # Розбір вхідного потоку -> (скільки байтів спожито, відповідь); (0, b"") — чекаємо ще байтів.
+        # v1-прошивка бере все по 5 байтів. v2 бачить SYNC -> кадр v2 (тіло [cmd, b1, b2, b3]),
+        # відомий cmd -> запит v1, будь-що інше пропускає по байту.
+        if self.version < 2 or buf[0] != SYNC:
+            if self.version >= 2 and buf[0] not in CMD_NAMES:
+                return 1, b""
+            if len(buf) < REQUEST_FRAME:
+                return 0, b""
+            return REQUEST_FRAME, self.handle(bytes(buf[:REQUEST_FRAME]))
+
+        if len(buf) < 2:
+            return 0, b""
+        length = buf[1]
+        if length < 4:
+            return 1, b""
+        size = length + V2_OVERHEAD
+        if len(buf) < size:
+            return 0, b""
+        # На платі CRC рахується таблицею, тут — та сама таблична версія
+        body, crc_ok = codec.decode_v2(bytes(buf[:size]), crc=codec.crc16_table)
+        self.framing = 2
+        self._since = None
+        if not crc_ok:
+            # Можливо, це випадковий SYNC: відповідаємо CHKERR, але зсуваємось лише на байт
+            return 1, self.send_response(body[0], STATUS_CHKERR, 0, 0, 0)
+        if body[0] == CMD_BULKSET:
+            return size, self.bulk_set(body[1:])
+        return size, self.process_command(*body[:4])
+
+    def process_command(self, cmd, b1, b2, b3):
+        self._since = None
+        if self.framing == 2:
+            if cmd == CMD_SYNC:
+                return self.sync_response(cmd, b1 << 8 | b2)
+            if b3 == DELTA_FLAG and cmd in (CMD_START, CMD_RESTART, CMD_CHEAT):
+                self._since = b1 << 8 | b2
+
+        if cmd == CMD_VERSION and self.version >= 2:
+            # Рукостискання: b1 — найвища версія хоста; відповідь завжди у форматі запиту (v1)
+            return self.send_response(cmd, STATUS_OK, min(b1, self.version), 0, 0)
+
+        if cmd == CMD_DIFFICULTY:
+            self.generate_sudoku(HOLES.get(b1, 0))
+            return self.send_response(cmd, STATUS_SETDIF, b1, b2, b3)
+
+        if cmd == CMD_START or cmd == CMD_RESTART:
+            return self.send_response(cmd, STATUS_OK, 0, 0, 0)
+
+        if cmd == CMD_GIVEUP:
+            return self.send_response(cmd, STATUS_LOSE, 0, 0, 0)
+
+        if cmd in (CMD_SET, CMD_CLEAR, CMD_HELP) and (b1 > 8 or b2 > 8):
+            # На STM32 це вихід за межі масиву; тут просто відмовляємо
+            return self.send_response(cmd, STATUS_INVALID, b1, b2, b3)
+
+        if cmd == CMD_SET:
+            i = b1 * 9 + b2
+            if self.matrix[i] != 0:
+                return self.send_response(cmd, STATUS_LOCKED, b1, b2, b3)
+            if self.rulle_game(b1, b2, b3):
+                self._write(i, b3)
+                if self.c_zero(self.matall) == 0:
+                    return self.send_response(cmd, STATUS_WIN, 7, 7, 7)
+                return self.send_response(cmd, STATUS_OK, b1, b2, b3)
+            return self.send_response(cmd, STATUS_INVALID, b1, b2, b3)
+
+        if cmd == CMD_CLEAR:
+            i = b1 * 9 + b2
+            if self.matrix[i] == 0:
+                self._write(i, 0)
+                return self.send_response(cmd, STATUS_OK, b1, b2, 0)
+            return self.send_response(cmd, STATUS_LOCKED, b1, b2, 0)
+
+        if cmd == CMD_FIELD:
+            return self.send_response(cmd, STATUS_OK, self.c_zero(self.matrix), self.c_zero(self.matall), 0)
+
+        if cmd == CMD_HELP:
+            i = b1 * 9 + b2
+            if self.matrix[i] == 0:
+                right_val = self.matCHEAT[i]
+                self._write(i, right_val)
+                return self.send_response(cmd, STATUS_NOOB, b1, b2, right_val)
+            return self.send_response(cmd, STATUS_LOCKED, b1, b2, 0)
+
+        if cmd == CMD_CHEAT:
+            self._write_all(self.matCHEAT)
+            return self.send_response(cmd, STATUS_OK_CHEAT, 6, 6, 6)
+
+        # switch без default: невідома команда лишається без відповіді
+        return b""
+
+    def bulk_set(self, data):
+        # CMD_BULKSET (лише v2): data = [n, (клітинка, значення) * n].
+        # Кожен хід — та сама перевірка, що й у CMD_SET, на полі після попередніх ходів.
+        n = data[0] if data else 0
+        if not n or len(data) != 1 + 2 * n:
+            return self.send_response(CMD_BULKSET, STATUS_INVALID, 0, 0, 0)
+        codes = []
+        for k in range(1, len(data), 2):
+            i, v = data[k], data[k + 1]
+            if i > 80 or not 1 <= v <= 9:
+                codes.append(BULK_INVALID)
+            elif self.matrix[i] != 0:
+                codes.append(BULK_LOCKED)
+            elif self.rulle_game(i // 9, i % 9, v):
+                self._write(i, v)
+                codes.append(BULK_OK)
+            else:
+                codes.append(BULK_INVALID)
+        status = STATUS_WIN if self.c_zero(self.matall) == 0 else STATUS_OK
+        return codec.encode_bulk_reply_v2(status, codes)
+
+    def generate_sudoku(self, difficulty):
+        rng = self.rng
+        level = LEVELS.get(difficulty)
+        # Задачі з бази мають менше дірок, ніж difficulty: рівень 3 — 22..29 підказок
+        # замість 16 (див. puzzle_pack.dig), але з єдиним розв'язком
+        picked = self.db.pick(level, rng=rng) if self.db is not None and level else None
+        if picked is not None:
+            puzzle, solution = picked
+            self.matCHEAT[:] = solution
+            self.matall[:] = puzzle
+            self.matrix[:] = puzzle
+            self._new_game()
+            return
+
+        m = bytearray(METALON)
+
+        for _ in range(15):
+            block = rng.randrange(3)
+            r1 = block * 3 + rng.randrange(3)
+            r2 = block * 3 + rng.randrange(3)
+            m[r1 * 9:r1 * 9 + 9], m[r2 * 9:r2 * 9 + 9] = m[r2 * 9:r2 * 9 + 9], m[r1 * 9:r1 * 9 + 9]
+
+            c1 = block * 3 + rng.randrange(3)
+            c2 = block * 3 + rng.randrange(3)
+            m[c1::9], m[c2::9] = m[c2::9], m[c1::9]
+
+        self.matCHEAT[:] = m
+
+        holes = difficulty
+        while holes > 0:
+            i = rng.randrange(81)
+            if m[i] != 0:
+                m[i] = 0
+                holes -= 1
+
+        self.matall[:] = m
+        self.matrix[:] = m
+        self._new_game()
+
+    def rulle_game(self, b1, b2, b3):
+        m = self.matall
+        for i in range(9):
+            if (i != b2 and m[b1 * 9 + i] == b3) or (i != b1 and m[i * 9 + b2] == b3):
+                return False
+
+        sR = (b1 // 3) * 3
+        sC = (b2 // 3) * 3
+        for r in range(sR, sR + 3):
+            for c in range(sC, sC + 3):
+                if r == b1 and c == b2:
+                    continue
+                if m[r * 9 + c] == b3:
+                    return False
+        return True
+
+    @staticmethod
+    def c_zero(m):
+        return m.count(0)
+
+    # ================= CHANGE LOG =================
+    def _bump(self):
+        self.seq += 1
+        if self.seq & 0xFFFF == NO_SEQ:
+            self.seq += 1
+
+    def _write(self, i, v):
+        if self.matall[i] == v:
+            return
+        self.matall[i] = v
+        self._bump()
+        if len(self._changes) == self._changes.maxlen:
+            # Найстаріша зміна випадає: дельта від seq до неї вже неможлива
+            self._base = self._changes[0][0]
+        self._changes.append((self.seq, i))
+
+    def _write_all(self, field):
+        for i in range(81):
+            self._write(i, field[i])
+
+    def _new_game(self):
+        # Нове поле не стикується з жодним старим seq
+        self._bump()
+        self._base = self.seq
+        self._changes.clear()
+
+    def delta_since(self, since16):
+        # -> [(клітинка, значення)] змін після seq хоста, або None, якщо потрібен FULL
+        if since16 == NO_SEQ:
+            return None
+        since = self.seq - ((self.seq - since16) & 0xFFFF)
+        if since < self._base:
+            return None
+        cells = sorted({i for q, i in self._changes if q > since})
+        if 2 * len(cells) >= 81:
+            return None
+        matall = self.matall
+        return [(i, matall[i]) for i in cells]
+
+    def sync_response(self, cmd, since16):
+        seq = self.seq & 0xFFFF
+        pairs = self.delta_since(since16)
+        if pairs is None:
+            # START несе початкове поле (як і довгий кадр), решта — поточне
+            return codec.encode_full_v2(cmd, seq, self.matrix if cmd == CMD_START else self.matall)
+        return codec.encode_delta_v2(cmd, seq, since16, pairs)
+
+    def send_response(self, cmd, status, b1, b2, b3):
+        v2 = self.framing == 2
+        if cmd == CMD_START or cmd == CMD_RESTART or cmd == CMD_CHEAT:
+            if cmd == CMD_RESTART:
+                self._write_all(self.matrix)
+            if self._since is not None:
+                return self.sync_response(cmd, self._since)
+            field = self.matCHEAT if cmd == CMD_CHEAT else self.matrix
+            return codec.encode_field_v2(cmd, status, field) if v2 else codec.encode_field(cmd, status, field)
+        if v2:
+            return codec.encode_short_v2(cmd, status, b1, b2, b3)
+        return codec.encode_short(cmd, status, b1, b2, b3)
+
+
+# ================= VIRTUAL SERIAL PORT =================
+class VirtualSerialDevice:
+    # Емулятор за Linux pty: клієнти відкривають self.port як звичайний COM-порт.
+
+    def __init__(self, firmware=None, byte_delay=0.0, jitter=0.0, seed=None, db=None, version=PROTOCOL_VERSION,
+                 latency=0.0):
+        self.firmware = firmware or FirmwareEmulator(seed, db, version)
+        self.byte_delay = byte_delay    # секунд на байт (115200 бод ~ 87 мкс)
+        self.jitter = jitter            # максимальна випадкова затримка відповіді, с
+        # Затримка доставки відповіді (USB-CDC опитує раз на 1 мс), с. На відміну від
+        # jitter, плата в цей час не зайнята: наступний запит обробляється одразу
+        self.latency = latency
+        self._delivery = collections.deque()    # (час доставки, байти)
+        self._delivery_ready = threading.Condition()
+        self.rng = random.Random(seed)
+
+        self.master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self._running = False
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        if self.latency:
+            threading.Thread(target=self._deliver, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        os.write(self._wake_w, b"x")
+        with self._delivery_ready:
+            self._delivery_ready.notify()
+        if self._thread:
+            self._thread.join(1)
+        for fd in (self.master, self._slave, self._wake_r, self._wake_w):
+            os.close(fd)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _serve(self):
+        # v1: як HAL_UART_Receive_IT(rx_buf, 5) — команди завжди по 5 байтів; v2 — див. FirmwareEmulator.take
+        # selectors (epoll/poll), а не select(): сотні емуляторів в одному процесі виходять за fd 1024
+        pending = bytearray()
+        sel = selectors.DefaultSelector()
+        sel.register(self.master, selectors.EVENT_READ)
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        while self._running:
+            ready = [key.fd for key, _ in sel.select()]
+            if self._wake_r in ready:
+                break
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                continue
+            self.rx_bytes += len(data)
+            pending += data
+            while pending:
+                n, reply = self.firmware.take(pending)
+                if not n:
+                    break
+                del pending[:n]
+                if reply:
+                    self._transmit(reply)
+        sel.close()
+
+    def _transmit(self, data):
+        if self.jitter:
+            time.sleep(self.rng.uniform(0, self.jitter))
+        if self.latency:
+            # Лінія зайнята стільки ж, скільки й без затримки; байти доходять пізніше
+            if self.byte_delay:
+                time.sleep(self.byte_delay * len(data))
+            with self._delivery_ready:
+                self._delivery.append((time.perf_counter() + self.latency, data))
+                self._delivery_ready.notify()
+        elif not self.byte_delay:
+            os.write(self.master, data)
+        else:
+            # Рівномірна подача байтів з темпом лінії
+            deadline = time.perf_counter()
+            for i in range(len(data)):
+                deadline += self.byte_delay
+                os.write(self.master, data[i:i + 1])
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        self.tx_bytes += len(data)
+
+    def _deliver(self):
+        while self._running:
+            with self._delivery_ready:
+                while not self._delivery and self._running:
+                    self._delivery_ready.wait()
+                if not self._running:
+                    return
+                due, data = self._delivery.popleft()
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                os.write(self.master, data)
+            except OSError:
+                return
+
+
+def main():
+    ap = argparse.ArgumentParser(description="STM32 Sudoku firmware emulator on a virtual serial port")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--byte-delay-us", type=float, default=0.0, help="line delay per byte (87 = 115200 baud)")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="max random delay before each reply")
+    ap.add_argument("--latency-ms", type=float, default=0.0,
+                    help="link delay added to each reply without blocking the firmware (USB-CDC ~ 1)")
+    ap.add_argument("--db", default=None, help="serve puzzles from a puzzle_db.py file")
+    ap.add_argument("--protocol", type=int, choices=(1, 2), default=PROTOCOL_VERSION,
+                    help="1 = legacy firmware without the VERSION handshake")
+    args = ap.parse_args()
+
+    db = None
+    if args.db:
+        from puzzle_db import PuzzleDB
+        db = PuzzleDB(args.db)
+
+    dev = VirtualSerialDevice(byte_delay=args.byte_delay_us / 1e6, jitter=args.jitter_ms / 1e3,
+                              seed=args.seed, db=db, version=args.protocol, latency=args.latency_ms / 1e3).start()
+    print(f"[EMULATOR] listening on {dev.port}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dev.stop()
+
+
+if __name__ == "__main__":
+    main()
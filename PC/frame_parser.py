@@ -0,0 +1,308 @@
+import time
+
+from codec import (FRAME_SIZE, LONG_CMDS, LONG_FRAME, LONG_FRAME_V2, V2_OVERHEAD, MAX_BODY, SYNC,
+                   CMD_VERSION, STATUS_OK, crc16, xor_fold)
+
+
+# ================= FRAME =================
+class Frame:
+    __slots__ = ("cmd", "status", "raw", "crc_ok")
+
+    def __init__(self, raw, crc_ok):
+        self.cmd = raw[0]
+        self.status = raw[1]
+        self.raw = raw
+        self.crc_ok = crc_ok
+
+    @property
+    def is_long(self):
+        return len(self.raw) == LONG_FRAME
+
+    @property
+    def payload(self):
+        # b1..b3 для короткого кадру, 81 клітинка для поля
+        return self.raw[2:-1]
+
+
+class FrameV2(Frame):
+    # raw = [SYNC, LEN, cmd, status, дані..., CRC16]
+    __slots__ = ()
+
+    def __init__(self, raw, crc_ok):
+        self.cmd = raw[2]
+        self.status = raw[3]
+        self.raw = raw
+        self.crc_ok = crc_ok
+
+    @property
+    def is_long(self):
+        return len(self.raw) == LONG_FRAME_V2
+
+    @property
+    def payload(self):
+        return self.raw[4:-2]
+
+
+# ================= PARSER =================
+class FrameParser:
+    # Кадри посилаються на внутрішній буфер (memoryview без копіювання),
+    # тому вони дійсні лише до наступного кроку ітерації feed().
+    # version=1: довжина кадру вгадується з cmd; version=2: SYNC + LEN + CRC16.
+    # Парсер сам переходить на v2, щойно пропустить через себе v1-відповідь
+    # на CMD_VERSION з версією 2 — наступний же кадр розбирається вже як v2.
+
+    def __init__(self, capacity=4096, version=1):
+        if capacity < MAX_BODY + V2_OVERHEAD:
+            raise ValueError("capacity must hold at least one v2 frame")
+        self.version = version
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+        self.frames = 0
+        self.crc_errors = 0
+        self.resyncs = 0
+
+    @property
+    def pending(self):
+        return self._end - self._start
+
+    def wanted(self):
+        # Скільки байтів бракує до кінця поточного кадру (мінімум 1)
+        pending = self._end - self._start
+        if not pending:
+            return 1
+        if self.version == 2:
+            if self._buf[self._start] != SYNC:
+                return 1
+            if pending < 2:
+                return 1
+            return max(1, self._buf[self._start + 1] + V2_OVERHEAD - pending)
+        size = FRAME_SIZE[self._buf[self._start]]
+        return max(1, size - pending)
+
+    def reset(self):
+        self._start = self._end = 0
+
+    def feed(self, data):
+        mv = memoryview(data)
+        while mv:
+            n = self._append(mv)
+            mv = mv[n:]
+            yield from self._drain()
+
+    def _append(self, mv):
+        cap = len(self._buf)
+        if self._end == cap or cap - self._end < len(mv):
+            # "Загортання" кільця: незавершений хвіст (менший за кадр) переїжджає на початок
+            pending = self._end - self._start
+            self._view[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+
+        n = min(len(mv), cap - self._end)
+        self._view[self._end:self._end + n] = mv[:n]
+        self._end += n
+        return n
+
+    def _drain(self):
+        # Версія перевіряється на кожному кадрі: перемикання відбувається посеред буфера
+        while self._start < self._end:
+            frame = self._next_v2() if self.version == 2 else self._next_v1()
+            if frame is None:
+                return
+            yield frame
+
+    def _next_v1(self):
+        # -> Frame або None, якщо кадр ще не прийшов повністю
+        buf = self._buf
+        sizes = FRAME_SIZE
+        while self._start < self._end:
+            pos = self._start
+            size = sizes[buf[pos]]
+            if not size:
+                # Невідомий cmd — зсуваємось на байт замість зависання
+                self._start = pos + 1
+                self.resyncs += 1
+                continue
+            if self._end - pos < size:
+                return None
+
+            last = pos + size - 1
+            crc_ok = xor_fold(self._view[pos:last]) == buf[last]
+            self._start = pos + size
+            if not crc_ok:
+                self.crc_errors += 1
+                return Frame(self._view[pos:pos + size], False)
+            self.frames += 1
+            if buf[pos] == CMD_VERSION and buf[pos + 1] == STATUS_OK and buf[pos + 2] >= 2:
+                self.version = 2
+            return Frame(self._view[pos:pos + size], True)
+        return None
+
+    def _next_v2(self):
+        # Сміття до SYNC пропускається одним find() (цикл у C), а не по байту.
+        # Зіпсований кадр зсуває початок лише на байт: SYNC усередині нього може
+        # бути початком справжнього кадру. Кожен байт перевіряється обмежену
+        # кількість разів (кадр <= 259 байтів), тож відновлення лінійне за байтами.
+        buf = self._buf
+        while self._start < self._end:
+            pos = self._start
+            if buf[pos] != SYNC:
+                nxt = buf.find(SYNC, pos + 1, self._end)
+                self._start = nxt if nxt >= 0 else self._end
+                self.resyncs += self._start - pos
+                continue
+            if self._end - pos < 2:
+                return None
+            length = buf[pos + 1]
+            if length < 2:
+                # У відповіді щонайменше cmd і status: це не заголовок
+                self._start = pos + 1
+                self.resyncs += 1
+                continue
+            size = length + V2_OVERHEAD
+            if self._end - pos < size:
+                return None
+
+            end = pos + size
+            crc_ok = crc16(self._view[pos + 1:end - 2]) == (buf[end - 2] << 8 | buf[end - 1])
+            if not crc_ok:
+                self._start = pos + 1
+                self.crc_errors += 1
+                self.resyncs += 1
+                return FrameV2(self._view[pos:end], False)
+            self._start = end
+            self.frames += 1
+            return FrameV2(self._view[pos:end], True)
+        return None
+
+
+# ================= BENCHMARK =================
+def _legacy_parse(buffer, chunk):
+    # Старий цикл з Sudoky.rx_thread (без GUI): копії list()/срізів і reduce
+    from functools import reduce
+    buffer.extend(chunk)
+    count = 0
+    while len(buffer) >= 6:
+        if buffer[0] in LONG_CMDS:
+            if len(buffer) < 84:
+                break
+            packet = list(buffer[:84])
+            buffer = buffer[84:]
+            if reduce(lambda x, y: x ^ y, packet[:83]) == packet[83]:
+                count += 1
+        else:
+            if len(buffer) < 6:
+                break
+            packet = list(buffer[:6])
+            buffer = buffer[6:]
+            if reduce(lambda x, y: x ^ y, packet[:5]) == packet[5]:
+                count += 1
+    return buffer, count
+
+
+def _make_burst(frames, chunk):
+    import random
+    rnd = random.Random(1)
+    stream = bytearray()
+    for _ in range(frames):
+        pkt = bytearray([0x01, 0x10]) + bytes(rnd.randrange(10) for _ in range(81))
+        pkt.append(xor_fold(pkt))
+        stream += pkt
+    return [bytes(stream[i:i + chunk]) for i in range(0, len(stream), chunk)]
+
+
+def _bench(frames=20000, chunk=256):
+    import tracemalloc
+
+    chunks = _make_burst(frames, chunk)
+
+    t = time.perf_counter()
+    buffer, legacy = bytearray(), 0
+    for c in chunks:
+        buffer, n = _legacy_parse(buffer, c)
+        legacy += n
+    t_legacy = time.perf_counter() - t
+
+    parser = FrameParser()
+    t = time.perf_counter()
+    for c in chunks:
+        for _ in parser.feed(c):
+            pass
+    t_new = time.perf_counter() - t
+    assert parser.frames == legacy == frames
+
+    tracemalloc.start()
+    parser = FrameParser()
+    for c in chunks:
+        for _ in parser.feed(c):
+            pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{frames} field frames, {chunk}-byte chunks")
+    print(f"  legacy : {frames / t_legacy:10.0f} frames/s")
+    print(f"  parser : {frames / t_new:10.0f} frames/s  (x{t_legacy / t_new:.1f})")
+    print(f"  parser peak alloc: {peak} bytes")
+
+    import codec
+    stream = b"".join(codec.encode_field_v2(c[0], c[1], c[2:83]) for c in (
+        b"".join(chunks)[i:i + LONG_FRAME] for i in range(0, frames * LONG_FRAME, LONG_FRAME)))
+    parser = FrameParser(version=2)
+    t = time.perf_counter()
+    for i in range(0, len(stream), chunk):
+        for _ in parser.feed(stream[i:i + chunk]):
+            pass
+    print(f"  parser v2: {frames / (time.perf_counter() - t):8.0f} frames/s")
+
+
+def _bench_resync(frames=20000, every=50, seed=1):
+    # Один загублений байт на кожні every кадрів: скільки кадрів пропало і скільки
+    # "кадрів" з правильною контрольною сумою виявились сміттям
+    import random
+    import codec
+
+    rnd = random.Random(seed)
+    replies = []
+    for _ in range(frames):
+        if rnd.random() < 0.2:
+            replies.append((codec.CMD_START, codec.STATUS_OK, bytes(rnd.randrange(10) for _ in range(81))))
+        else:
+            replies.append((codec.CMD_SET, codec.STATUS_OK, bytes((rnd.randrange(9), rnd.randrange(9), rnd.randrange(1, 10)))))
+
+    for version in (1, 2):
+        good = set()
+        intact = 0
+        stream = bytearray()
+        for k, (cmd, status, data) in enumerate(replies):
+            if len(data) == 81:
+                pkt = codec.encode_field(cmd, status, data) if version == 1 else codec.encode_field_v2(cmd, status, data)
+            else:
+                pkt = codec.encode_short(cmd, status, *data) if version == 1 else codec.encode_short_v2(cmd, status, *data)
+            if k % every == every // 2:
+                cut = rnd.randrange(len(pkt))
+                pkt = pkt[:cut] + pkt[cut + 1:]
+            else:
+                good.add(bytes(pkt))
+                intact += 1
+            stream += pkt
+
+        parser = FrameParser(version=version)
+        received = bogus = 0
+        t = time.perf_counter()
+        for i in range(0, len(stream), 256):
+            for frame in parser.feed(stream[i:i + 256]):
+                if frame.crc_ok:
+                    if bytes(frame.raw) in good:
+                        received += 1
+                    else:
+                        bogus += 1
+        dt = time.perf_counter() - t
+        print(f"v{version}: {intact} intact frames sent, {received} received, {intact - received} lost, "
+              f"{bogus} bogus accepted, {parser.resyncs} bytes skipped, {len(stream) / dt / 1e6:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    _bench()
+    _bench_resync()
@@ -0,0 +1,167 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+import serial
+import serial.tools.list_ports
+
+# ================= INOTIFY =================
+IN_ATTRIB = 0x00000004
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")      # wd, mask, cookie, len; далі len байтів імені
+
+
+class _Inotify:
+    # Мінімальна обгортка inotify через ctypes (Linux); без сторонніх пакетів
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), IN_CREATE | IN_ATTRIB | IN_MOVED_TO) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch({path}) failed")
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        # -> імена файлів з усіх подій, що накопичилися
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        off = 0
+        while off < len(data):
+            _, _, _, length = _EVENT.unpack_from(data, off)
+            off += _EVENT.size
+            names.append(data[off:off + length].rstrip(b"\0").decode(errors="replace"))
+            off += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+# ================= PORT IDENTITY =================
+def serial_number(device):
+    # USB-серійник порту (None для pty, вбудованих UART тощо)
+    for p in serial.tools.list_ports.comports():
+        if p.device == device:
+            return p.serial_number
+    return None
+
+
+def find_device(serial_no):
+    for p in serial.tools.list_ports.comports():
+        if p.serial_number == serial_no:
+            return p.device
+    return None
+
+
+class PortWatcher:
+    # Чекає повернення порту. Плата шукається за USB-серійником, тож
+    # переперелік на інший ttyACM теж знаходиться; без серійника — за шляхом.
+    # Між спробами потік спить на inotify /dev і прокидається, щойно там
+    # з'явився tty; якщо inotify недоступний (або dev_dir=None) — опитування раз на poll_interval.
+    # Невдале відкриття (udev ще не виставив права тощо) — повтор з
+    # експоненційною паузою від min_backoff до max_backoff.
+
+    def __init__(self, device, serial_no=None, dev_dir="/dev", poll_interval=1.0,
+                 min_backoff=0.05, max_backoff=2.0):
+        self.device = device
+        self.serial_no = serial_no
+        self.dev_dir = dev_dir
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+    @classmethod
+    def for_port(cls, device, **kw):
+        return cls(device, serial_number(device), **kw)
+
+    def resolve(self):
+        if self.serial_no:
+            found = find_device(self.serial_no)
+            if found:
+                return found
+        return self.device if os.path.exists(self.device) else None
+
+    def wait(self, is_running, open_port, check_every=0.5):
+        # open_port(path) -> об'єкт порту або виняток; -> порт або None, якщо is_running() став False.
+        # Перелік портів (comports) — лише на першій спробі, після tty-події в /dev
+        # і на повторах після невдалого відкриття; тайм-аут select лише перевіряє is_running.
+        notify = None
+        if self.dev_dir:
+            try:
+                notify = _Inotify(self.dev_dir)
+            except (OSError, AttributeError):
+                pass
+        backoff = self.min_backoff
+        attempt = True
+        try:
+            while is_running():
+                if attempt:
+                    path = self.resolve()
+                    if path:
+                        try:
+                            port = open_port(path)
+                            self.device = path
+                            return port
+                        except (OSError, serial.SerialException):
+                            time.sleep(backoff)
+                            backoff = min(backoff * 2, self.max_backoff)
+                            continue
+                    backoff = self.min_backoff
+                if notify is None:
+                    time.sleep(self.poll_interval)
+                    attempt = True
+                    continue
+                # Спимо до появи нового tty
+                ready, _, _ = select.select([notify], [], [], check_every)
+                attempt = bool(ready) and any(name.startswith("tty") for name in notify.read())
+            return None
+        finally:
+            if notify is not None:
+                notify.close()
+
+
+# ================= BENCHMARK =================
+def _bench(rounds=20):
+    # Час від появи "порту" до його відкриття: inotify проти опитування раз на секунду.
+    # Порт імітується файлом ttyFAKE у тимчасовому каталозі.
+    import tempfile
+    import threading
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "ttyFAKE")
+        for mode, dev_dir, rounds_ in (("inotify", d, rounds), ("poll 1 s", None, 3)):
+            delays = []
+            for _ in range(rounds_):
+                watcher = PortWatcher(path, dev_dir=dev_dir)
+                opened = []
+                th = threading.Thread(target=lambda: opened.append(
+                    watcher.wait(lambda: not opened, lambda p: time.perf_counter())))
+                th.start()
+                time.sleep(0.2)
+                t = time.perf_counter()
+                open(path, "w").close()
+                th.join(5)
+                delays.append((opened[0] - t) * 1000)
+                os.unlink(path)
+            delays.sort()
+            print(f"{mode:9s}: reopen after {delays[len(delays) // 2]:7.2f} ms (median), max {delays[-1]:7.2f} ms")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,208 @@
+import argparse
+import multiprocessing
+import os
+import selectors
+import time
+
+import serial
+
+import codec
+from board import BoardModel
+from frame_parser import FrameParser
+from link_stats import Histogram, LinkStats
+
+
+class DeviceSession:
+    # Стан однієї плати в хабі: порт, власний парсер, дзеркало поля й метрики.
+    # on_frame(session, frame) викликається з циклу хабу для кожного кадру.
+    # pyserial лише налаштовує порт; читання й запис — os.read/os.write на
+    # неблокуючому fd, бо read()/write() pyserial роблять select() на кожен виклик
+    # і падають на fd >= 1024 (кожен порт pyserial займає 5 дескрипторів).
+
+    def __init__(self, hub, port, ser):
+        self.hub = hub
+        self.port = port
+        self.ser = ser
+        self.fd = ser.fileno()
+        self._out = bytearray()     # те, що порт не прийняв одразу
+        self.parser = FrameParser()
+        self.stats = LinkStats()
+        self.stats.attach(self.parser)
+        self.board = BoardModel()
+        self.on_frame = None
+
+    def send(self, cmd, b1=0, b2=0, b3=0):
+        pkt = codec.encode(cmd, b1, b2, b3)
+        self.stats.on_tx(pkt)
+        if self._out:
+            self._out += pkt
+            return
+        try:
+            n = os.write(self.fd, pkt)
+        except BlockingIOError:
+            n = 0
+        if n < len(pkt):
+            self._out += pkt[n:]
+            self.hub._want_write(self, True)
+
+    def _writable(self):
+        try:
+            n = os.write(self.fd, self._out)
+        except BlockingIOError:
+            return
+        del self._out[:n]
+        if not self._out:
+            self.hub._want_write(self, False)
+
+    def _readable(self):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        if not data:
+            raise serial.SerialException(f"{self.port}: device disconnected")
+        self.stats.on_rx(data)
+        for frame in self.parser.feed(data):
+            self.stats.on_frame(frame)
+            if frame.crc_ok:
+                self.board.apply_reply(frame.cmd, frame.status, frame.payload)
+            if self.on_frame:
+                self.on_frame(self, frame)
+
+    def close(self):
+        self.ser.close()
+
+
+class Hub:
+    # Один потік, один selectors-цикл на всі порти: без потоку й тайм-ауту на кожну плату.
+    # Кадри розбираються тим самим FrameParser і віддаються сесії свого порту.
+
+    def __init__(self, session_cls=DeviceSession):
+        self.session_cls = session_cls
+        self.sel = selectors.DefaultSelector()
+        self.sessions = []
+        self.started = time.monotonic()
+
+    def open(self, port, baud=115200):
+        ser = serial.Serial(port, baud, timeout=0)
+        session = self.session_cls(self, port, ser)
+        os.set_blocking(session.fd, False)
+        self.sel.register(session.fd, selectors.EVENT_READ, session)
+        self.sessions.append(session)
+        return session
+
+    def _want_write(self, session, on):
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if on else 0)
+        self.sel.modify(session.fd, events, session)
+
+    def remove(self, session):
+        self.sel.unregister(session.fd)
+        self.sessions.remove(session)
+        session.close()
+
+    def poll(self, timeout=None):
+        # -> кількість портів, з яких щось прочитано
+        events = self.sel.select(timeout)
+        for key, mask in events:
+            session = key.data
+            try:
+                if mask & selectors.EVENT_WRITE:
+                    session._writable()
+                if mask & selectors.EVENT_READ:
+                    session._readable()
+            except (OSError, serial.SerialException):
+                if session in self.sessions:
+                    self.remove(session)
+        return len(events)
+
+    def run(self, until=None, duration=None, tick=0.1):
+        # until() -> True зупиняє цикл; duration — максимум секунд
+        deadline = time.monotonic() + duration if duration else None
+        while self.sessions:
+            if until and until():
+                return
+            if deadline and time.monotonic() >= deadline:
+                return
+            self.poll(tick)
+
+    def close(self):
+        for session in list(self.sessions):
+            self.remove(session)
+        self.sel.close()
+
+    # ================= AGGREGATE =================
+    def snapshot(self):
+        total = {"uptime_s": round(time.monotonic() - self.started, 3), "devices": len(self.sessions)}
+        for key in ("tx_bytes", "tx_frames", "rx_bytes", "rx_frames", "crc_errors", "resyncs", "lost"):
+            total[key] = sum(getattr(s.stats, key) for s in self.sessions)
+        return total
+
+    def rtt(self):
+        # Гістограма RTT по всіх платах і командах
+        merged = Histogram()
+        for s in self.sessions:
+            for h in s.stats.rtt.values():
+                for k, c in enumerate(h.counts):
+                    merged.counts[k] += c
+                merged.n += h.n
+                merged.total += h.total
+                merged.max = max(merged.max, h.max)
+                if h.min is not None and (merged.min is None or h.min < merged.min):
+                    merged.min = h.min
+        return merged
+
+
+# ================= BENCHMARK =================
+def _farm(devices, byte_delay, conn):
+    # Емулятори в окремому процесі, щоб не ділити GIL з хабом
+    from emulator import VirtualSerialDevice
+
+    emus = [VirtualSerialDevice(seed=i, byte_delay=byte_delay).start() for i in range(devices)]
+    conn.send([dev.port for dev in emus])
+    conn.recv()
+    for dev in emus:
+        dev.stop()
+
+
+def _bench(devices=64, duration=3.0, byte_delay=0.0):
+    # Хаб тримає по одному FIELD "у польоті" на кожну плату
+    conn, child = multiprocessing.Pipe()
+    farm = multiprocessing.Process(target=_farm, args=(devices, byte_delay, child), daemon=True)
+    farm.start()
+    ports = conn.recv()
+
+    hub = Hub()
+    try:
+        def pingpong(session, frame):
+            session.send(codec.CMD_FIELD)
+
+        for port in ports:
+            hub.open(port).on_frame = pingpong
+        for session in hub.sessions:
+            session.send(codec.CMD_FIELD)
+
+        cpu = time.thread_time()
+        t = time.monotonic()
+        hub.run(duration=duration)
+        dt = time.monotonic() - t
+        cpu = time.thread_time() - cpu
+
+        snap = hub.snapshot()
+        h = hub.rtt()
+        print(f"{devices:4d} devices: {snap['rx_frames'] / dt:8.0f} frames/s  {snap['rx_bytes'] / dt:9.0f} B/s  "
+              f"hub CPU {cpu / dt * 100:5.1f}%  RTT p50 {h.percentile(50) / 1000:6.2f} ms  "
+              f"p99 {h.percentile(99) / 1000:6.2f} ms  max {h.max / 1000:6.2f} ms  lost {snap['lost']}")
+    finally:
+        hub.close()
+        conn.send("stop")
+        farm.join(5)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Single-threaded multi-board hub benchmark on emulated devices")
+    ap.add_argument("-n", "--devices", type=int, nargs="+", default=[1, 16, 64, 128])
+    ap.add_argument("--duration", type=float, default=3.0)
+    ap.add_argument("--byte-delay-us", type=float, default=0.0, help="line delay per byte (87 = 115200 baud)")
+    args = ap.parse_args()
+    for n in args.devices:
+        _bench(n, args.duration, args.byte_delay_us / 1e6)
@@ -0,0 +1,240 @@
+import argparse
+import os
+import struct
+import threading
+import time
+
+# ================= FORMAT =================
+# Журнал поточної партії: заголовок, далі записи "тип, дані, XOR усіх попередніх байтів запису".
+# BEGIN відкриває партію (рівень + початкове поле), далі лише підтверджені платою ходи,
+# END закриває партію. Нова партія переписує файл, тож він не росте між іграми.
+MAGIC = b"SDKJ"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHH")     # magic, version, резерв
+
+BEGIN, SET, CLEAR, HELP, END = b"B", b"S", b"C", b"H", b"E"
+PAYLOAD = {BEGIN: 82, SET: 3, CLEAR: 3, HELP: 3, END: 0}   # BEGIN: рівень + 81 клітинка
+
+
+def _record(kind, payload=b""):
+    body = kind + bytes(payload)
+    x = 0
+    for b in body:
+        x ^= b
+    return body + bytes([x])
+
+
+class Session:
+    # Стан партії, відновлений з журналу
+    __slots__ = ("level", "initial", "cells", "moves", "finished")
+
+    def __init__(self, level, initial):
+        self.level = level
+        self.initial = bytes(initial)
+        self.cells = bytearray(initial)
+        self.moves = 0
+        self.finished = False
+
+    def apply(self, kind, r, c, v):
+        if r > 8 or c > 8:
+            return
+        i = r * 9 + c
+        if self.initial[i]:
+            return
+        self.cells[i] = 0 if kind == CLEAR else v
+        self.moves += 1
+
+    # Те саме, що b1/b2 у відповіді на CMD_FIELD: c_zero(matrix), c_zero(matall)
+    @property
+    def holes(self):
+        return self.initial.count(0)
+
+    @property
+    def empty(self):
+        return self.cells.count(0)
+
+
+def load(path):
+    # -> Session останньої партії або None; обірваний чи зіпсований хвіст ігнорується
+    return _scan(path)[0]
+
+
+def _scan(path):
+    # -> (Session або None, довжина цілої частини файлу)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None, 0
+    if len(data) < HEADER.size:
+        return None, 0
+    magic, version, _ = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a session journal (v{VERSION})")
+
+    session = None
+    off = HEADER.size
+    while off < len(data):
+        kind = data[off:off + 1]
+        size = PAYLOAD.get(kind)
+        if size is None or off + size + 2 > len(data):
+            break
+        body = data[off:off + size + 1]
+        if _record(kind, body[1:])[-1] != data[off + size + 1]:
+            break
+        off += size + 2
+        if kind == BEGIN:
+            session = Session(body[1], body[2:])
+        elif session is None:
+            break
+        elif kind == END:
+            session.finished = True
+        else:
+            session.apply(kind, body[1], body[2], body[3])
+    return session, off
+
+
+class Journal:
+    # Запис іде одразу через os.write: після падіння GUI все, що встигли
+    # записати, вже в кеші ОС. fsync (захист від збою живлення) — пакетом у
+    # фоновому потоці, не частіше ніж раз на interval, лише коли є нові записи.
+    # begin() і end() синхронізуються одразу: це межі партії.
+
+    def __init__(self, path, interval=0.2):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._fd = None
+        self._running = True
+        self.session, end = _scan(path)
+        if self.session is not None and not self.session.finished:
+            # Обірваний хвіст відрізаємо, інакше нові записи опиняться за сміттям
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+            os.ftruncate(self._fd, end)
+        self.syncs = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def active(self):
+        return self.session is not None and not self.session.finished
+
+    def begin(self, level, initial):
+        # Нова партія: тимчасовий файл + rename, старий журнал лишається цілим до останнього моменту
+        tmp = self.path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, HEADER.pack(MAGIC, VERSION, 0) + _record(BEGIN, bytes([level]) + bytes(initial)))
+            os.fsync(fd)
+        except OSError:
+            os.close(fd)
+            raise
+        os.replace(tmp, self.path)
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = fd
+            self.session = Session(level, initial)
+
+    def _append(self, kind, payload=b""):
+        with self._lock:
+            if self._fd is None:
+                return
+            os.write(self._fd, _record(kind, payload))
+        self._dirty.set()
+
+    def set(self, r, c, v):
+        if self.active:
+            self.session.apply(SET, r, c, v)
+            self._append(SET, (r, c, v))
+
+    def clear(self, r, c):
+        if self.active:
+            self.session.apply(CLEAR, r, c, 0)
+            self._append(CLEAR, (r, c, 0))
+
+    def help(self, r, c, v):
+        if self.active:
+            self.session.apply(HELP, r, c, v)
+            self._append(HELP, (r, c, v))
+
+    def end(self):
+        if not self.active:
+            return
+        self.session.finished = True
+        self._append(END)
+        self.sync()
+
+    def sync(self):
+        # fsync поза блокуванням: запис ходу з циклу Tk не чекає на диск
+        self._dirty.clear()
+        with self._lock:
+            fd = self._fd
+        if fd is None:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            return      # fd закрив begin(): новий файл уже синхронізовано
+        self.syncs += 1
+
+    def _run(self):
+        while self._running:
+            self._dirty.wait()
+            if not self._running:
+                return
+            time.sleep(self.interval)     # збираємо всі ходи за інтервал в один fsync
+            self.sync()
+
+    def close(self):
+        self._running = False
+        self._dirty.set()
+        self._thread.join(1)
+        with self._lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+
+
+# ================= BENCHMARK =================
+def _bench(path, moves=2000):
+    # Вартість запису ходу: fsync на кожен хід проти пакетного
+    initial = bytes(81)
+    for name, interval in (("fsync per move", None), ("batched 200 ms", 0.2)):
+        j = Journal(path, interval or 0.2)
+        j.begin(1, initial)
+        t = time.perf_counter()
+        for k in range(moves):
+            j.set(k % 9, (k // 9) % 9, k % 9 + 1)
+            if interval is None:
+                j.sync()
+        dt = time.perf_counter() - t
+        j.close()
+        print(f"{name:15s}: {dt / moves * 1e6:8.1f} us/move, {j.syncs} fsync(s)")
+    t = time.perf_counter()
+    session = load(path)
+    print(f"load           : {(time.perf_counter() - t) * 1e3:8.2f} ms for {session.moves} moves")
+
+
+def _dump(path):
+    session = load(path)
+    if session is None:
+        print("no session")
+        return
+    print(f"level {session.level}, {session.moves} move(s), {'finished' if session.finished else 'in progress'}")
+    for r in range(9):
+        print(" ".join(str(v) if v else "." for v in session.cells[r * 9:r * 9 + 9]))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect or benchmark the session journal")
+    ap.add_argument("path")
+    ap.add_argument("--bench", action="store_true", help="overwrite PATH with a benchmark journal")
+    args = ap.parse_args()
+    if args.bench:
+        _bench(args.path)
+    else:
+        _dump(args.path)
@@ -0,0 +1,179 @@
+import collections
+import json
+import time
+
+from codec import CMD_NAMES, STATUS_CHKERR, request_cmd, split_requests
+
+
+class Histogram:
+    # Логарифмічні кошики по 2^k мкс: запис — bit_length() та інкремент, без сортування
+    BUCKETS = 24    # до ~8 с
+
+    __slots__ = ("counts", "n", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.n = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, us):
+        us = int(us)
+        self.counts[min(us.bit_length(), self.BUCKETS - 1)] += 1
+        self.n += 1
+        self.total += us
+        if self.min is None or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, p):
+        # Верхня межа кошика, в який потрапляє p-й перцентиль
+        if not self.n:
+            return 0
+        rank = p / 100 * self.n
+        seen = 0
+        for k, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(1 << k, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else 0
+
+    def to_dict(self):
+        return {"count": self.n, "mean_us": round(self.mean, 1), "min_us": self.min or 0, "max_us": self.max,
+                "p50_us": self.percentile(50), "p90_us": self.percentile(90), "p99_us": self.percentile(99),
+                "buckets_us": {1 << k: c for k, c in enumerate(self.counts) if c}}
+
+
+class LinkStats:
+    # Метрики лінку. Без блокувань: TX-лічильники пише лише потік відправки,
+    # RX-лічильники й гістограми — лише потік прийому; спільні тільки черги
+    # часів відправки (deque.append/popleft атомарні).
+    # Плата відповідає строго по черзі, тож відповідь на cmd закриває найстаріший запит з тим cmd.
+
+    def __init__(self, timeout=2.0):
+        self.timeout_ns = int(timeout * 1e9)
+        self.started = time.monotonic()
+        self.rtt = collections.defaultdict(Histogram)               # назва команди -> Histogram
+        self._inflight = collections.defaultdict(lambda: collections.deque(maxlen=64))
+        self._parser = None
+
+        self.tx_bytes = 0
+        self.tx_frames = 0
+        self.rx_bytes = 0
+        self.rx_frames = 0
+        self.crc_errors = 0     # зіпсовані кадри від плати
+        self.chkerr = 0         # плата повідомила, що наш кадр зіпсований
+        self.lost = 0           # запити без відповіді довше за timeout
+
+    def attach(self, parser):
+        # FrameParser сам рахує ресинхронізації; беремо його лічильник
+        self._parser = parser
+
+    @property
+    def resyncs(self):
+        return self._parser.resyncs if self._parser else 0
+
+    # ================= HOOKS =================
+    def on_tx(self, data):
+        now = time.monotonic_ns()
+        for pkt in split_requests(data):
+            self._inflight[request_cmd(pkt)].append(now)
+            self.tx_frames += 1
+        self.tx_bytes += len(data)
+
+    def on_rx(self, chunk):
+        self.rx_bytes += len(chunk)
+
+    def on_frame(self, frame):
+        now = time.monotonic_ns()
+        self.rx_frames += 1
+        if not frame.crc_ok:
+            self.crc_errors += 1
+            return
+        if frame.status == STATUS_CHKERR:
+            self.chkerr += 1
+        queue = self._inflight.get(frame.cmd)
+        while queue:
+            sent = queue.popleft()
+            if now - sent <= self.timeout_ns:
+                self.rtt[CMD_NAMES.get(frame.cmd, hex(frame.cmd))].record((now - sent) // 1000)
+                return
+            self.lost += 1
+
+    # ================= EXPORT =================
+    def snapshot(self):
+        return {
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "tx_bytes": self.tx_bytes, "tx_frames": self.tx_frames,
+            "rx_bytes": self.rx_bytes, "rx_frames": self.rx_frames,
+            "crc_errors": self.crc_errors, "chkerr": self.chkerr,
+            "resyncs": self.resyncs, "lost": self.lost,
+            "rtt": {name: h.to_dict() for name, h in sorted(self.rtt.items())},
+        }
+
+    @staticmethod
+    def rates(prev, cur):
+        # Швидкості між двома snapshot(): байти/с і кадри/с
+        dt = (cur["uptime_s"] - prev["uptime_s"]) or 1e-9
+        return {k + "_per_s": (cur[k] - prev[k]) / dt for k in ("tx_bytes", "tx_frames", "rx_bytes", "rx_frames")}
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+# ================= LIVE PANEL =================
+class StatsPanel:
+    # Окреме вікно з метриками, оновлюється раз на interval_ms
+
+    def __init__(self, root, stats, interval_ms=1000):
+        import tkinter as tk
+        from tkinter import filedialog
+
+        self._filedialog = filedialog
+        self.stats = stats
+        self.interval_ms = interval_ms
+        self.win = tk.Toplevel(root)
+        self.win.title("Link statistics")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.text = tk.Label(self.win, font=("Courier", 10), justify=tk.LEFT, anchor="nw", bg="white")
+        self.text.pack(fill="both", expand=True, padx=10, pady=10)
+        tk.Button(self.win, text="Export JSON", command=self.export).pack(pady=(0, 10))
+
+        self._prev = stats.snapshot()
+        self._after = None
+        self.refresh()
+
+    def refresh(self):
+        cur = self.stats.snapshot()
+        r = LinkStats.rates(self._prev, cur)
+        self._prev = cur
+        lines = [
+            f"TX {cur['tx_frames']:7d} frames {cur['tx_bytes']:9d} B   {r['tx_frames_per_s']:7.1f} fr/s {r['tx_bytes_per_s']:8.0f} B/s",
+            f"RX {cur['rx_frames']:7d} frames {cur['rx_bytes']:9d} B   {r['rx_frames_per_s']:7.1f} fr/s {r['rx_bytes_per_s']:8.0f} B/s",
+            f"CRC errors {cur['crc_errors']}   CHKERR {cur['chkerr']}   resyncs {cur['resyncs']}   lost {cur['lost']}",
+            "",
+            f"{'RTT (us)':12s} {'n':>6s} {'mean':>8s} {'p50':>8s} {'p99':>8s} {'max':>8s}",
+        ]
+        for name, h in cur["rtt"].items():
+            lines.append(f"{name:12s} {h['count']:6d} {h['mean_us']:8.0f} {h['p50_us']:8d} {h['p99_us']:8d} {h['max_us']:8d}")
+        self.text.config(text="\n".join(lines))
+        self._after = self.win.after(self.interval_ms, self.refresh)
+
+    def export(self):
+        path = self._filedialog.asksaveasfilename(parent=self.win, defaultextension=".json",
+                                                  filetypes=[("JSON", "*.json")])
+        if path:
+            self.stats.export_json(path)
+
+    def close(self):
+        if self._after:
+            self.win.after_cancel(self._after)
+        self.win.destroy()
@@ -3,38 +3,38 @@ from tkinter import ttk, messagebox
 import serial
 import serial.tools.list_ports
 import threading
-import time
-from functools import reduce
-
-# ================= PROTOCOL CONSTANTS =================
-CMD_START    = 0x01
-CMD_RESTART  = 0x02
-CMD_GIVEUP   = 0x03
-CMD_SET      = 0x04
-CMD_CLEAR    = 0x05
-CMD_CLEARALL = 0x06
-CMD_FIELD    = 0x07
+
+import codec
+import serial_rx
+from board_view import LabelBoard
+from codec import (CMD_START, CMD_RESTART, CMD_SET, CMD_CLEAR, CMD_FIELD,
+                   STATUS_OK, STATUS_INVALID, STATUS_LOCKED, STATUS_CHKERR, STATUS_LOSE, STATUS_WIN)
+from frame_parser import FrameParser
+from hotplug import PortWatcher
+from ui_queue import UiEventQueue
 
 STATUS_MAP = {
-    0x10: "OK",
-    0x11: "INVALID",
-    0x12: "LOCKED",
-    0x14: "YOU LOSE",
-    0x15: "YOU WIN"
+    STATUS_OK:      "OK",
+    STATUS_INVALID: "INVALID",
+    STATUS_LOCKED:  "LOCKED",
+    STATUS_CHKERR:  "CRC ERROR",
+    STATUS_LOSE:    "YOU LOSE",
+    STATUS_WIN:     "YOU WIN"
 }
 
 class SudokuGUI:
-    def init(self, root):
+    def __init__(self, root):
         self.root = root
         self.root.title("STM32 Sudoku - Full Debug Mode")
         self.root.geometry("950x670")
 
         self.ser = None
         self.last_port = None
+        self.watcher = None         # PortWatcher: чекає повернення плати після відключення
         self.is_reconnecting = False
 
         self.selected_cell = (0, 0)
-        self.cells = [[None]*9 for _ in range(9)]
+        self.board = None
         self.locked_cells = set() # Зберігаємо координати заблокованих клітинок
         
         self.status_bar = tk.Label(root, text="Підключіть мікроконтролер",
@@ -42,48 +42,42 @@ class SudokuGUI:
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
         self.overlay = None
+        self.ui = UiEventQueue(self.root)
+        self.ui.start()
         self.create_menu()
 
     # ========== SERIAL CORE (XOR CHECKSUM) ==========
-    def checksum(self, *data):
-        return reduce(lambda x, y: x ^ y, data)
-
     def send_cmd(self, cmd, b1=0, b2=0, b3=0):
         if not self.ser or not self.ser.is_open:
             return
         try:
-            crc = self.checksum(cmd, b1, b2, b3)
-            pkt = bytes([cmd, b1, b2, b3, crc])
+            pkt = codec.encode(cmd, b1, b2, b3)
             self.ser.write(pkt)
-            print(f"[TX] -> {pkt.hex(' ').upper()} (XOR CRC: {hex(crc)})")
+            print(f"[TX] -> {pkt.hex(' ').upper()} (XOR CRC: {hex(pkt[-1])})")
         except (serial.SerialException, OSError):
             self.handle_disconnect()
 
     def rx_thread(self):
-        buffer = bytearray()
-        while self.ser and self.ser.is_open:
-            try:
-                if self.ser.in_waiting > 0:
-                    chunk = self.ser.read(self.ser.in_waiting)
-                    buffer.extend(chunk)
-                    
-                    while len(buffer) >= 84:
-                        packet = list(buffer[:84])
-                        buffer = buffer[84:]
-                        
-                        matrix_data = packet[2:83]
-                        status_byte = packet[1]
-                        self.root.after(0, self.update_field, matrix_data, status_byte)
-                else:
-                    time.sleep(0.01)
-            except Exception as e:
-                if not self.is_reconnecting:
-                    self.root.after(0, self.handle_disconnect)
-                break
+        try:
+            serial_rx.pump(self.ser, FrameParser(), self.handle_frame, lambda: not self.is_reconnecting)
+        except Exception:
+            if not self.is_reconnecting:
+                self.ui.post(self.handle_disconnect)
+
+    def handle_frame(self, frame):
+        if not frame.crc_ok:
+            self.ui.post(self.show_status, STATUS_CHKERR)
+            return
+        # Поле приходить лише у довгих кадрах (84 байти), решта — 6-байтові статуси
+        if frame.is_long:
+            self.ui.post(self.update_field, bytes(frame.payload), frame.status, key="field")
+        else:
+            self.ui.post(self.show_status, frame.status)
 
     # ========== RECONNECT SYSTEM ==========
     def handle_disconnect(self):
         self.is_reconnecting = True
+        serial_rx.wake(self.ser)
         if self.ser:
             try: self.ser.close()
             except: pass
@@ -100,16 +94,16 @@ class SudokuGUI:
 
 
     def reconnect_loop(self):
-        while self.is_reconnecting:
-            if self.last_port in [p.device for p in serial.tools.list_ports.comports()]:
-                try:
-                    self.ser = serial.Serial(self.last_port, 115200, timeout=0.1)
-                    self.is_reconnecting = False
-                    self.root.after(0, self.on_reconnect_success)
-                    return
-                except: pass
-            time.sleep(1)
-            def on_reconnect_success(self):
+        ser = self.watcher.wait(lambda: self.is_reconnecting,
+                                lambda path: serial.Serial(path, 115200, timeout=0.1))
+        if ser is None:
+            return
+        self.ser = ser
+        self.last_port = self.watcher.device
+        self.is_reconnecting = False
+        self.ui.post(self.on_reconnect_success)
+
+    def on_reconnect_success(self):
         if self.overlay: self.overlay.destroy(); self.overlay = None
         self.status_bar.config(text=f"Зв'язок відновлено: {self.last_port}", fg="green")
         threading.Thread(target=self.rx_thread, daemon=True).start()
@@ -127,6 +121,7 @@ class SudokuGUI:
         try:
             self.ser = serial.Serial(port, 115200, timeout=0.1)
             self.last_port = port
+            self.watcher = PortWatcher.for_port(port)
             self.btn_start.config(state=tk.NORMAL)
             self.btn_connect.config(state=tk.DISABLED, text="Підключено")
             threading.Thread(target=self.rx_thread, daemon=True).start()
@@ -177,20 +172,10 @@ class SudokuGUI:
         tk.Button(ctrl, text="RESTART", width=22, bg="#ffeaa7",
                   command=lambda: self.restart_action()).grid(row=6, column=0, columnspan=3, pady=5)
 
-        grid_frame = tk.Frame(self.game_container, bg="#2c3e50", bd=2)
-        grid_frame.pack(side=tk.RIGHT)
-
+        self.board = LabelBoard(self.game_container, self.select_cell, font=("Arial", 22, "bold"),
+                                fg="#2c3e50", edge_pad=False)
+        self.board.pack(side=tk.RIGHT)
 
-        for r in range(9):
-            for c in range(9):
-                cell = tk.Label(grid_frame, text="", width=2, height=1, 
-                                font=("Arial", 22, "bold"), bg="white", fg="#2c3e50")
-                px = 4 if (c+1) % 3 == 0 and c < 8 else 1
-                py = 4 if (r+1) % 3 == 0 and r < 8 else 1
-                cell.grid(row=r, column=c, padx=(1, px), pady=(1, py))
-                cell.bind("<Button-1>", lambda e, row=r, col=c: self.select_cell(row, col))
-                self.cells[r][c] = cell
-        
         self.select_cell(0, 0)
         # ========== LOGIC ACTIONS ==========
     def restart_action(self):
@@ -201,10 +186,10 @@ class SudokuGUI:
         # Повертаємо попередній клітинці її колір (білий або сірий)
         prev_r, prev_c = self.selected_cell
         bg_color = "#f0f0f0" if (prev_r, prev_c) in self.locked_cells else "white"
-        self.cells[prev_r][prev_c].config(bg=bg_color)
+        self.board.set(prev_r, prev_c, bg=bg_color)
         
         self.selected_cell = (r, c)
-        self.cells[r][c].config(bg="#74b9ff") # Колір виділення
+        self.board.set(r, c, bg="#74b9ff") # Колір виділення
         
         status_text = f"Клітинка: [{r+1}, {c+1}]"
         if (r, c) in self.locked_cells:
@@ -220,7 +205,7 @@ class SudokuGUI:
             return
 
         # Візуальна зміна (синім кольором як "чернетка")
-        self.cells[r][c].config(text=str(val) if val != 0 else "", fg="#0984e3")
+        self.board.set(r, c, text=str(val) if val != 0 else "", fg="#0984e3")
         
         if val == 0:
             self.send_cmd(CMD_CLEAR, r, c)
@@ -232,7 +217,9 @@ class SudokuGUI:
 
     def update_field(self, field_data, status):
         if len(field_data) < 81: return
-        
+
+        board = self.board
+        before = board.updates
         for i in range(81):
             val = field_data[i]
             r, c = i // 9, i % 9
@@ -244,8 +231,8 @@ class SudokuGUI:
                 # (якщо locked_cells ще порожня)
                 pass
 
-            # Оновлюємо текст
-            self.cells[r][c].config(text=str(val) if val != 0 else "")
+            # Оновлюємо текст (board сам пропускає незмінені клітинки)
+            board.set(r, c, text=str(val) if val != 0 else "")
             
             # Якщо статус 0x12 прийшов від МК — додаємо клітинку в locked на льоту
             if status == 0x12 and r == self.selected_cell[0] and c == self.selected_cell[1]:
@@ -253,19 +240,24 @@ class SudokuGUI:
 
             # Візуальне оформлення заблокованих клітинок
             if (r, c) in self.locked_cells:
-                self.cells[r][c].config(fg="#2d3436", bg="#f0f0f0") # Темно-сірий текст, сірий фон
+                board.set(r, c, fg="#2d3436", bg="#f0f0f0") # Темно-сірий текст, сірий фон
             else:
                 # Звичайні клітинки, які ввів користувач
-                if self.cells[r][c].cget("bg") != "#74b9ff": # Якщо не виділена зараз
-                    self.cells[r][c].config(fg="#0984e3", bg="white")
+                if board.bg(r, c) != "#74b9ff": # Якщо не виділена зараз
+                    board.set(r, c, fg="#0984e3", bg="white")
 
         # Якщо контролер прямо каже, що ми наступили на заблоковану клітинку
         if status == 0x12:
             self.locked_cells.add(self.selected_cell)
-            self.cells[self.selected_cell[0]][self.selected_cell[1]].config(bg="#f0f0f0")
+            board.set(self.selected_cell[0], self.selected_cell[1], bg="#f0f0f0")
+
+        board.frame_updates = board.updates - before
+        print(f"[RENDER] {board.frame_updates}/81 cells updated")
+        self.show_status(status)
 
+    def show_status(self, status):
         txt = STATUS_MAP.get(status, f"Код: {hex(status)}")
-        color = "red" if status == 0x12 else "black"
+        color = "red" if status in (STATUS_LOCKED, STATUS_CHKERR) else "black"
         self.status_bar.config(text=f"Статус гри: {txt}", fg=color)
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+import argparse
+import mmap
+import random
+import struct
+
+# ================= FORMAT =================
+# Заголовок | індекс | записи.
+# Запис — умова й розв'язок, по 81 клітинці на 4 біти (41 байт кожне).
+# Записи відсортовані за (рівень, кількість підказок), тож кожен рівень
+# і кожна пара (рівень, підказки) — суцільний діапазон, описаний в індексі.
+MAGIC = b"SDKB"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHII")       # magic, version, записів в індексі, записів, зсув даних
+INDEX_ENTRY = struct.Struct("<BBHII")   # рівень, підказки, резерв, перший запис, кількість
+
+PACKED = 41
+RECORD = PACKED * 2
+
+_HI = bytes(x >> 4 for x in range(256))
+_LO = bytes(x & 0x0F for x in range(256))
+
+
+def pack(board):
+    # 81 значення 0..9 -> 41 байт, старший напівбайт першим
+    b = bytes(board) + b"\0"
+    return bytes(h << 4 | l for h, l in zip(b[0::2], b[1::2]))
+
+
+def unpack(data):
+    # 41 байт -> bytes(81)
+    out = bytearray(PACKED * 2)
+    out[0::2] = bytes(data).translate(_HI)
+    out[1::2] = bytes(data).translate(_LO)
+    del out[81:]
+    return bytes(out)
+
+
+# ================= WRITE =================
+def build(path, records):
+    # records — ітерабельне (puzzle, solution, level); -> кількість записів
+    rows = sorted(((level, 81 - bytes(puzzle).count(0), pack(puzzle), pack(solution))
+                   for puzzle, solution, level in records), key=lambda r: (r[0], r[1]))
+
+    index = []
+    for i, (level, clues, _, _) in enumerate(rows):
+        if index and index[-1][:2] == [level, clues]:
+            index[-1][3] += 1
+        else:
+            index.append([level, clues, i, 1])
+
+    data_offset = HEADER.size + INDEX_ENTRY.size * len(index)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(index), len(rows), data_offset))
+        for level, clues, first, count in index:
+            f.write(INDEX_ENTRY.pack(level, clues, 0, first, count))
+        for _, _, puzzle, solution in rows:
+            f.write(puzzle)
+            f.write(solution)
+    return len(rows)
+
+
+def read_pack(path):
+    # Рядки з puzzle_pack.py: "<умова> <розв'язок> <рівень> <підказки>"
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 3:
+                continue
+            puzzle = bytes(int(ch) if ch.isdigit() else 0 for ch in parts[0])
+            solution = bytes(int(ch) for ch in parts[1])
+            yield puzzle, solution, int(parts[2])
+
+
+# ================= READ =================
+class PuzzleDB:
+    # Файл відкривається через mmap: у пам'ять потрапляють лише сторінки,
+    # які справді читаються, а вибір випадкової задачі рівня — O(1).
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_index, self.count, self._data = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a puzzle database (v{VERSION})")
+
+        self.index = {}     # (рівень, підказки) -> (перший, кількість)
+        self.levels = {}    # рівень -> (перший, кількість)
+        for k in range(n_index):
+            level, clues, _, first, count = INDEX_ENTRY.unpack_from(self._mm, HEADER.size + k * INDEX_ENTRY.size)
+            self.index[level, clues] = (first, count)
+            start, total = self.levels.get(level, (first, 0))
+            self.levels[level] = (start, total + count)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        # -> (умова, розв'язок), кожне bytes(81)
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        off = self._data + i * RECORD
+        return unpack(self._mm[off:off + PACKED]), unpack(self._mm[off + PACKED:off + RECORD])
+
+    def pick(self, level, clues=None, rng=random):
+        # Випадкова задача рівня (і, за бажанням, з точною кількістю підказок) або None
+        first, count = self.levels.get(level, (0, 0)) if clues is None else self.index.get((level, clues), (0, 0))
+        if not count:
+            return None
+        return self[first + rng.randrange(count)]
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Nibble-packed Sudoku puzzle database")
+    sub = ap.add_subparsers(dest="action", required=True)
+    p = sub.add_parser("build", help="build a database from puzzle_pack.py output")
+    p.add_argument("packs", nargs="+")
+    p.add_argument("-o", "--output", default="puzzles.db")
+    p = sub.add_parser("info", help="show the level / clue index")
+    p.add_argument("db")
+    args = ap.parse_args()
+
+    if args.action == "build":
+        records = [r for path in args.packs for r in read_pack(path)]
+        n = build(args.output, records)
+        print(f"[DB] {n} puzzles -> {args.output} ({RECORD} bytes each)")
+        return
+
+    with PuzzleDB(args.db) as db:
+        print(f"[DB] {args.db}: {len(db)} puzzles")
+        for (level, clues), (first, count) in sorted(db.index.items()):
+            print(f"  level {level}  clues {clues:2d}: {count}")
+
+
+if __name__ == "__main__":
+    main()
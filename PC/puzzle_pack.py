@@ -0,0 +1,148 @@
+import argparse
+import concurrent.futures
+import os
+import random
+import time
+
+import solver
+from emulator import METALON, HOLES
+
+
+# ================= TRANSFORMS =================
+def transform(grid, rng):
+    # Випадковий елемент повної групи перетворень, що зберігають правила:
+    # перейменування цифр, перестановки рядків у смузі та самих смуг,
+    # стовпців у стеку та самих стеків, транспонування.
+    # generate_sudoku у прошивці міняє лише рядки/стовпці всередині смуг.
+    digits = list(range(1, 10))
+    rng.shuffle(digits)
+    relabel = bytes([0] + digits)
+
+    def axis():
+        bands = [0, 1, 2]
+        rng.shuffle(bands)
+        order = []
+        for b in bands:
+            inner = [0, 1, 2]
+            rng.shuffle(inner)
+            order.extend(b * 3 + k for k in inner)
+        return order
+
+    rows, cols = axis(), axis()
+    if rng.random() < 0.5:
+        return bytes(relabel[grid[c * 9 + r]] for r in rows for c in cols)
+    return bytes(relabel[grid[r * 9 + c]] for r in rows for c in cols)
+
+
+# ================= CLUE REMOVAL =================
+def _still_unique(puzzle, i, value):
+    # Поле було єдиним; після вилучення клітинки i воно лишається єдиним,
+    # лише якщо жодна інша цифра в i не дає розв'язку
+    for v in range(1, 10):
+        if v == value:
+            continue
+        puzzle[i] = v
+        if solver.solve(puzzle) is not None:
+            puzzle[i] = 0
+            return False
+    puzzle[i] = 0
+    return True
+
+
+# HOLES — скільки клітинок стирає прошивка, не дбаючи про єдиність. Тут кожне
+# вилучення має зберегти єдиний розв'язок, тож один жадібний прохід зупиняється
+# раніше: рівень 3 (65 дірок = 16 підказок, менше за мінімальні 17) недосяжний.
+# Фактично (200 задач на рівень): рівень 1 — 56 підказок, рівень 2 — 36,
+# рівень 3 — 22..29, найчастіше 25..27. Саме ці задачі віддають puzzle_db
+# і emulator.py --db під рівнем 3.
+def dig(solution, holes, rng):
+    # Вилучає до holes клітинок у випадковому порядку, зберігаючи єдиність розв'язку.
+    # -> bytearray(81) з нулями на місці вилучених; дірок може вийти менше за holes
+    puzzle = bytearray(solution)
+    order = list(range(81))
+    rng.shuffle(order)
+    removed = 0
+    for i in order:
+        if removed == holes:
+            break
+        value = puzzle[i]
+        puzzle[i] = 0
+        if _still_unique(puzzle, i, value):
+            removed += 1
+        else:
+            puzzle[i] = value
+    return puzzle
+
+
+def make_puzzle(level, rng):
+    solution = transform(METALON, rng)
+    return dig(solution, HOLES[level], rng), solution
+
+
+def _build_chunk(seed, count, level):
+    # Виконується в процесі пулу -> (рядки для файлу, підказки задач, що не дійшли до HOLES[level])
+    rng = random.Random(seed)
+    lines = []
+    short = []
+    for _ in range(count):
+        puzzle, solution = make_puzzle(level, rng)
+        clues = 81 - puzzle.count(0)
+        if clues > 81 - HOLES[level]:
+            short.append(clues)
+        lines.append(f"{format_board(puzzle)} {format_board(solution)} {level} {clues}\n")
+    return lines, short
+
+
+def format_board(board):
+    return "".join(str(v) if v else "." for v in board)
+
+
+# ================= PACK =================
+def build_pack(path, count, level, jobs=None, chunk=16, seed=None):
+    # Пул процесів; готові шматки дописуються у файл по мірі завершення,
+    # одночасно в роботі не більше jobs * 2 шматків.
+    # -> (задач, секунд, процесів, підказки задач, що не дійшли до HOLES[level])
+    jobs = jobs or os.cpu_count() or 1
+    seeds = random.Random(seed)
+    sizes = [min(chunk, count - k) for k in range(0, count, chunk)]
+    done = 0
+    short = []
+
+    t = time.perf_counter()
+    with open(path, "w") as out, concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        pending = set()
+        while sizes or pending:
+            while sizes and len(pending) < jobs * 2:
+                pending.add(pool.submit(_build_chunk, seeds.getrandbits(64), sizes.pop(), level))
+            finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in finished:
+                lines, chunk_short = fut.result()
+                short.extend(chunk_short)
+                out.writelines(lines)
+                done += len(lines)
+            out.flush()
+    return done, time.perf_counter() - t, jobs, short
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build a pack of unique-solution Sudoku puzzles")
+    ap.add_argument("-o", "--output", default="pack.txt")
+    ap.add_argument("-n", "--count", type=int, default=1000)
+    ap.add_argument("-l", "--level", type=int, choices=sorted(HOLES), default=2)
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--chunk", type=int, default=16, help="puzzles per task")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    done, dt, jobs, short = build_pack(args.output, args.count, args.level, args.jobs, args.chunk, args.seed)
+    rate = done / dt
+    print(f"[PACK] {done} puzzles (level {args.level}) -> {args.output} in {dt:.1f} s: "
+          f"{rate:.1f} puzzles/s, {rate / jobs:.1f} puzzles/s/core on {jobs} worker(s)")
+    if short:
+        print(f"[PACK] warning: {len(short)} of {done} puzzles stopped short of {HOLES[args.level]} holes "
+              f"({81 - HOLES[args.level]} clues): they have {min(short)}..{max(short)} clues "
+              f"and keep a unique solution")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import collections
+import os
+import string
+import sys
+import threading
+import time
+
+TRACE, DEBUG, INFO, WARN, ERROR = 5, 10, 20, 30, 40
+LEVELS = {"trace": TRACE, "debug": DEBUG, "info": INFO, "warn": WARN, "error": ERROR}
+
+# Трасування вмикається лише змінною оточення до старту процесу. Виклики
+# стоять під "if ringlog.TRACING:", тож вимкнене — це одна перевірка
+# глобальної константи, аргументи навіть не обчислюються.
+TRACING = os.environ.get("SUDOKU_TRACE") == "1"
+
+
+class _Formatter(string.Formatter):
+    # "{0:hex}" — hex-дамп байтів, формується вже у фоновому потоці
+    def format_field(self, value, spec):
+        if spec == "hex":
+            return bytes(value).hex(" ").upper()
+        return super().format_field(value, spec)
+
+
+class RingLogger:
+    # Гарячий шлях лише кладе кортеж (рівень, шаблон, аргументи) у кільцевий
+    # буфер; форматування й запис у потік — у фоновому потоці раз на interval.
+    # Аргументи мають бути незмінними: memoryview з парсера треба копіювати в bytes.
+    # Переповнений буфер (deque з maxlen) викидає найстаріші записи, а не гальмує прийом.
+
+    def __init__(self, level=INFO, capacity=8192, stream=None, interval=0.05):
+        self.level = level
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self._ring = collections.deque(maxlen=capacity)
+        self._fmt = _Formatter()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+        self.logged = 0
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(1)
+            self._thread = None
+        self._drain()
+
+    def flush(self):
+        self._drain()
+
+    # ================= HOT PATH =================
+    def log(self, level, fmt, *args):
+        if level >= self.level:
+            self._ring.append((level, fmt, args))
+
+    def trace(self, fmt, *args):
+        if self.level <= TRACE:
+            self._ring.append((TRACE, fmt, args))
+
+    def debug(self, fmt, *args):
+        if self.level <= DEBUG:
+            self._ring.append((DEBUG, fmt, args))
+
+    def info(self, fmt, *args):
+        if self.level <= INFO:
+            self._ring.append((INFO, fmt, args))
+
+    def warn(self, fmt, *args):
+        if self.level <= WARN:
+            self._ring.append((WARN, fmt, args))
+
+    def error(self, fmt, *args):
+        if self.level <= ERROR:
+            self._ring.append((ERROR, fmt, args))
+
+    # ================= BACKGROUND =================
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.interval)
+            self._drain()
+
+    def _drain(self):
+        ring = self._ring
+        lines = []
+        fmt = self._fmt.format
+        while ring:
+            try:
+                _, template, args = ring.popleft()
+            except IndexError:
+                break
+            lines.append(fmt(template, *args) if args else template)
+        if lines:
+            self.logged += len(lines)
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+
+
+# ================= BENCHMARK =================
+def _bench(packets=20000):
+    import codec
+    from codec import CMD_SET, CMD_NAMES, STATUS_OK, STATUS_MAP
+    from frame_parser import FrameParser
+
+    stream = open(os.devnull, "w")
+    data = codec.encode_short(CMD_SET, STATUS_OK, 1, 2, 3) * packets
+
+    def legacy(frame):
+        # Як було в Sudoky.handle_frame
+        print(f"\033[92m[RX PACKET SHORT (STATUS)]:\033[0m {bytes(frame.raw).hex(' ').upper()}", file=stream)
+        print(f"    \033[92m[CRC OK]\033[0m status: {STATUS_MAP.get(frame.status)}", file=stream)
+        print("=============================", file=stream)
+
+    def run(on_frame):
+        parser = FrameParser()
+        t = time.perf_counter()
+        for i in range(0, len(data), 4096):
+            for frame in parser.feed(data[i:i + 4096]):
+                on_frame(frame)
+        return (time.perf_counter() - t) / packets * 1e6
+
+    base = run(lambda frame: None)
+    print(f"no logging     : {base:6.2f} us/packet")
+    print(f"print()        : {run(legacy):6.2f} us/packet")
+    for name, level in (("ring, DEBUG on", DEBUG), ("ring, DEBUG off", INFO)):
+        log = RingLogger(level, capacity=packets * 4, stream=stream).start()
+
+        def ring(frame):
+            log.debug("[RX PACKET SHORT (STATUS)]: {0:hex}", bytes(frame.raw))
+            log.debug("    [CRC OK] status: {0}", CMD_NAMES.get(frame.cmd))
+            if TRACING:
+                log.trace("    parser: {0} frames", frame.cmd)
+
+        us = run(ring)
+        t = time.perf_counter()
+        log.close()
+        print(f"{name:15s}: {us:6.2f} us/packet  (+{(time.perf_counter() - t) * 1e3:.0f} ms off-thread formatting)")
+
+
+if __name__ == "__main__":
+    _bench()
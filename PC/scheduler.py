@@ -0,0 +1,128 @@
+import codec
+from codec import CMD_START, CMD_FIELD, CMD_CLEARALL
+
+# Повтор цих команд нічого не змінює на платі, тож дублікат у черзі зайвий
+IDEMPOTENT = (CMD_START, CMD_FIELD)
+# Прошивка на них не відповідає: чекати відповіді нема чого
+NO_REPLY = (CMD_CLEARALL,)
+
+
+class CommandScheduler:
+    # Вихідна черга команд; запити FIELD згортаються до одного на вікно.
+    # v1-прошивка читає запит по 5 байтів (HAL_UART_Receive_IT) і відповідає
+    # блокуючим HAL_UART_Transmit прямо в колбеку прийому: запит, що прийшов,
+    # поки плата передає, губиться. Тому за замовчуванням window=1 — наступний
+    # кадр іде лише після відповіді на попередній (reply()) або тайм-ауту.
+    # window=None — усе, що накопичилось за прохід циклу подій, одним ser.write()
+    # (для протоколу v2, де прошивка розбирає потік за довжиною кадру).
+    #   write(data)        — запис пачки байтів у порт
+    #   schedule(ms, fn)   — таймер циклу подій (для Tk це root.after)
+
+    def __init__(self, write, schedule, field_window_ms=100, window=1, reply_timeout_ms=200):
+        self._write = write
+        self._schedule = schedule
+        self.encode = codec.encode     # codec.encode_v2 після рукостискання
+        self.field_window_ms = field_window_ms
+        self.window = window
+        self.reply_timeout_ms = reply_timeout_ms
+        self.inflight = 0               # кадрів без відповіді
+        self._timer = 0                 # номер поточного тайм-ауту: старі таймери нічого не роблять
+
+        self._queue = []                # (cmd, b1, b2, b3): кодуються при відправці, вже потрібною версією
+        self._flush_pending = False
+        self.paused = False             # на час рукостискання черга лише накопичується
+        self._field_pending = False
+
+        self.requested = 0  # кадрів попросили надіслати
+        self.sent = 0       # кадрів реально пішло в порт
+        self.writes = 0     # викликів ser.write
+        self.dropped = 0    # викинуто clear() після розриву
+        self.timeouts = 0   # відповідь не прийшла за reply_timeout_ms
+
+    @property
+    def saved(self):
+        return self.requested - self.sent - self.dropped - len(self._queue)
+
+    def send(self, cmd, b1=0, b2=0, b3=0):
+        self.requested += 1
+        req = (cmd, b1, b2, b3)
+        if cmd in IDEMPOTENT and req in self._queue:
+            return
+        self._queue.append(req)
+        if not self._flush_pending:
+            self._flush_pending = True
+            self._schedule(0, self.flush)
+
+    def request_field(self):
+        # Debounce: один FIELD наприкінці вікна покриває всі запити всередині нього
+        if self._field_pending:
+            self.requested += 1
+            return
+        self._field_pending = True
+        self._schedule(self.field_window_ms, self._fire_field)
+
+    def _fire_field(self):
+        self._field_pending = False
+        self.send(CMD_FIELD)
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        if self._queue and not self._flush_pending:
+            self._flush_pending = True
+            self._schedule(0, self.flush)
+
+    def flush(self):
+        self._flush_pending = False
+        if not self._queue or self.paused:
+            return
+        if self.window is None:
+            batch = self._queue[:]
+            self._queue.clear()
+        else:
+            batch = []
+            while self._queue and self.inflight < self.window:
+                req = self._queue.pop(0)
+                batch.append(req)
+                if req[0] not in NO_REPLY:
+                    self.inflight += 1
+            if not batch:
+                return
+            if self.inflight:
+                self._timer += 1
+                self._schedule(self.reply_timeout_ms, lambda timer=self._timer: self._timeout(timer))
+        encode = self.encode
+        data = b"".join([encode(*req) for req in batch])
+        self.sent += len(batch)
+        self.writes += 1
+        self._write(data)
+
+    def reply(self):
+        # Прийшла відповідь (будь-яка, і з поганою CRC): звільняється місце у вікні
+        if self.inflight:
+            self.inflight -= 1
+        if self.inflight == 0:
+            self._timer += 1
+        if self._queue and not self._flush_pending:
+            self._flush_pending = True
+            self._schedule(0, self.flush)
+
+    def _timeout(self, timer):
+        if timer != self._timer:
+            return
+        self.timeouts += 1
+        self.inflight = 0
+        self.flush()
+
+    def clear(self):
+        # Після розриву зв'язку старі команди вже неактуальні
+        self.dropped += len(self._queue)
+        self._queue.clear()
+        self.inflight = 0
+        self._timer += 1
+
+    def stats(self):
+        return {"requested": self.requested, "sent": self.sent, "saved": self.saved,
+                "dropped": self.dropped, "writes": self.writes, "timeouts": self.timeouts}
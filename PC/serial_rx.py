@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+
+import serial
+
+from frame_parser import FrameParser
+
+
+# ================= EVENT-DRIVEN RX =================
+# pyserial з timeout=None блокується в select() на fd порту, тож потік
+# прокидається лише коли прийшли байти: без sleep() і без опитування in_waiting.
+
+def pump(ser, parser, on_frame, is_running, on_data=None):
+    # on_data(chunk) — сирі байти до розбору (наприклад, запис сесії)
+    ser.timeout = None
+    while is_running() and ser.is_open:
+        # Читаємо рівно до кінця кадру або все, що вже лежить у драйвері
+        chunk = ser.read(max(parser.wanted(), ser.in_waiting))
+        if not chunk:
+            continue    # cancel_read() з іншого потоку
+        if on_data:
+            on_data(chunk)
+        for frame in parser.feed(chunk):
+            on_frame(frame)
+
+
+def wake(ser):
+    # Розбудити потік, заблокований у pump(), перед закриттям порту
+    try:
+        if ser and ser.is_open:
+            ser.cancel_read()
+    except (AttributeError, OSError, serial.SerialException):
+        pass
+
+
+# ================= BENCHMARK (pty) =================
+def _poll_pump(ser, parser, on_frame, is_running):
+    # Старий режим: in_waiting + sleep(0.01)
+    while is_running() and ser.is_open:
+        if ser.in_waiting > 0:
+            for frame in parser.feed(ser.read(ser.in_waiting)):
+                on_frame(frame)
+        time.sleep(0.01)
+
+
+def _measure(loop, rounds=200, idle=1.0):
+    master, slave = os.openpty()
+    ser = serial.Serial(os.ttyname(slave), 115200, timeout=0.1)
+    arrived = threading.Event()
+    stamp = [0.0]
+    running = [True]
+
+    def on_frame(frame):
+        stamp[0] = time.perf_counter()
+        arrived.set()
+
+    t = threading.Thread(target=loop, args=(ser, FrameParser(), on_frame, lambda: running[0]), daemon=True)
+    t.start()
+    time.sleep(0.05)
+
+    cpu = time.process_time()
+    time.sleep(idle)
+    idle_cpu = (time.process_time() - cpu) / idle * 100
+
+    pkt = bytes([0x04, 0x10, 1, 2, 3, 0x04 ^ 0x10 ^ 1 ^ 2 ^ 3])
+    lat = []
+    for _ in range(rounds):
+        arrived.clear()
+        os.write(master, pkt)
+        sent = time.perf_counter()
+        arrived.wait(1)
+        lat.append((stamp[0] - sent) * 1000)
+        time.sleep(0.002)
+
+    running[0] = False
+    wake(ser)
+    t.join(1)
+    ser.close()
+    os.close(master)
+    os.close(slave)
+    lat.sort()
+    return idle_cpu, lat[len(lat) // 2], lat[int(len(lat) * 0.99) - 1]
+
+
+if __name__ == "__main__":
+    for name, loop in (("poll 10 ms", _poll_pump), ("event", pump)):
+        cpu, p50, p99 = _measure(loop)
+        print(f"{name:10s}: idle CPU {cpu:5.2f}%  latency p50 {p50:6.3f} ms  p99 {p99:6.3f} ms")
@@ -0,0 +1,297 @@
+import threading
+import time
+
+# ================= TABLES =================
+# Цифра d зберігається як біт 1 << (d - 1); ALL — усі дев'ять цифр
+ALL = 0x1FF
+
+ROW = [i // 9 for i in range(81)]
+COL = [i % 9 for i in range(81)]
+BOX = [(i // 27) * 3 + (i % 9) // 3 for i in range(81)]
+
+UNITS = ([tuple(r * 9 + c for c in range(9)) for r in range(9)] +
+         [tuple(r * 9 + c for r in range(9)) for c in range(9)] +
+         [tuple(i for i in range(81) if BOX[i] == b) for b in range(9)])
+
+POP = [bin(m).count("1") for m in range(512)]
+DIGIT = {1 << d: d + 1 for d in range(9)}
+
+# 20 сусідів клітинки: той самий рядок, стовпець або квадрат
+PEERS = [tuple(sorted({j for unit in UNITS if i in unit for j in unit} - {i})) for i in range(81)]
+# Номери трьох блоків клітинки в UNITS: рядок, стовпець, квадрат
+CELL_UNITS = [(ROW[i], 9 + COL[i], 18 + BOX[i]) for i in range(81)]
+
+
+# ================= SEARCH =================
+# Стан — grid (цифри), cands (маска кандидатів кожної порожньої клітинки, 0 — заповнена)
+# і dirty (27 прапорців: блоки, де маски змінились з останньої перевірки).
+# Маски не перераховуються з нуля: ставлячи цифру, прибираємо її лише в 20 сусідів,
+# а приховані одиночки шукаємо лише в змінених блоках.
+def _assign(grid, cands, dirty, i, bit):
+    # Ставить цифру й каскадом усі голі одиночки, що з'явились у сусідів.
+    # -> False при суперечності
+    todo = [(i, bit)]
+    while todo:
+        i, bit = todo.pop()
+        if not cands[i] & bit:
+            return False    # клітинку вже зайнято або цифру в неї вже заборонено
+        grid[i] = DIGIT[bit]
+        cands[i] = 0
+        a, b, c = CELL_UNITS[i]
+        dirty[a] = dirty[b] = dirty[c] = 1
+        rest = ~bit
+        for p in PEERS[i]:
+            m = cands[p]
+            if m & bit:
+                m &= rest
+                if not m:
+                    return False
+                cands[p] = m
+                a, b, c = CELL_UNITS[p]
+                dirty[a] = dirty[b] = dirty[c] = 1
+                if not m & (m - 1):
+                    todo.append((p, m))
+    return True
+
+
+def _propagate(grid, cands, dirty):
+    # Приховані одиночки до нерухомої точки: за прохід застосовуються всі знайдені
+    # у змінених блоках (голі одиночки ставить сам _assign). -> False при суперечності
+    while True:
+        seen = False
+        for u in range(27):
+            if not dirty[u]:
+                continue
+            dirty[u] = 0
+            seen = True
+            unit = UNITS[u]
+            once = twice = placed = 0
+            for i in unit:
+                m = cands[i]
+                if m:
+                    twice |= once & m
+                    once |= m
+                else:
+                    placed |= 1 << (grid[i] - 1)
+            if once | placed != ALL:
+                return False    # якась цифра не має місця в блоці
+            single = once & ~twice
+            while single:
+                bit = single & -single
+                single ^= bit
+                for i in unit:
+                    if cands[i] & bit:
+                        if not _assign(grid, cands, dirty, i, bit):
+                            return False
+                        break
+        if not seen:
+            return True
+
+
+def _search(grid, cands, dirty, limit, solutions):
+    if not _propagate(grid, cands, dirty):
+        return 0
+    best, best_n = -1, 10
+    for i in range(81):
+        m = cands[i]
+        if m:
+            n = POP[m]
+            if n < best_n:
+                best, best_n = i, n
+                if n == 2:
+                    break
+    if best < 0:
+        solutions.append(bytes(grid))
+        return 1
+
+    count = 0
+    m = cands[best]
+    while m:
+        bit = m & -m
+        m ^= bit
+        g, c, d = grid[:], cands[:], bytearray(27)
+        if _assign(g, c, d, best, bit):
+            count += _search(g, c, d, limit - count, solutions)
+            if count >= limit:
+                break
+    return count
+
+
+def _load(board):
+    grid = [0] * 81
+    cands = [0] * 81
+    used = [0] * 27     # рядки, стовпці, квадрати — як у UNITS
+    for i in range(81):
+        v = board[i]
+        if v:
+            bit = 1 << (v - 1)
+            a, b, c = CELL_UNITS[i]
+            if (used[a] | used[b] | used[c]) & bit:
+                return None     # початкові цифри вже конфліктують
+            grid[i] = v
+            used[a] |= bit
+            used[b] |= bit
+            used[c] |= bit
+    singles = []
+    for i in range(81):
+        if not grid[i]:
+            a, b, c = CELL_UNITS[i]
+            m = ALL & ~(used[a] | used[b] | used[c])
+            if not m:
+                return None
+            cands[i] = m
+            if not m & (m - 1):
+                singles.append((i, m))
+    dirty = bytearray(b"\x01" * 27)
+    for i, bit in singles:
+        if not grid[i] and not _assign(grid, cands, dirty, i, bit):
+            return None
+    return grid, cands, dirty
+
+
+# ================= API =================
+def count_solutions(board, limit=2):
+    # board — 81 значення 0..9 (0 — порожньо), рядок за рядком
+    state = _load(board)
+    if state is None:
+        return 0
+    return _search(*state, limit, [])
+
+
+def solve(board):
+    # -> bytes(81) з розв'язком або None
+    state = _load(board)
+    if state is None:
+        return None
+    solutions = []
+    _search(*state, 1, solutions)
+    return solutions[0] if solutions else None
+
+
+def solve_unique(board):
+    # -> (розв'язок | None, кількість розв'язків, обмежена 2)
+    state = _load(board)
+    if state is None:
+        return None, 0
+    solutions = []
+    n = _search(*state, 2, solutions)
+    return (solutions[0] if solutions else None), n
+
+
+def parse(text):
+    # "4.....8.5.3..." / "400000805030..." -> list(81)
+    return [int(ch) if ch.isdigit() else 0 for ch in text if ch.isdigit() or ch == "."]
+
+
+# ================= BACKGROUND CHECK =================
+class SolvabilityCheck:
+    # "Чи можна ще дорішати поле" поза циклом Tk: на важкому полі пошук триває
+    # до ~20 мс. submit() лише кладе знімок; потік рахує найновіший, проміжні
+    # знімки (кілька ходів поспіль) пропускаються.
+    # on_result(gen, solvable, ms) викликається з потоку перевірки.
+
+    def __init__(self, on_result):
+        self.on_result = on_result
+        self._cond = threading.Condition()
+        self._board = None
+        self._gen = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, board):
+        # -> номер знімка: результат для старішого номера вже неактуальний
+        with self._cond:
+            self._gen += 1
+            self._board = bytes(board)
+            self._cond.notify()
+            return self._gen
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._board is None and self._running:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                board, gen = self._board, self._gen
+                self._board = None
+            t = time.perf_counter()
+            solvable = count_solutions(board, limit=1) > 0
+            self.on_result(gen, solvable, (time.perf_counter() - t) * 1000)
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(1)
+
+
+# ================= BENCHMARK =================
+HARD = (
+    "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......",
+    "52...6.........7.13...........4..8..6......5...........418.........3..2...87.....",
+    "6.....8.3.4.7.................5.4.7.3..2.....1.6.......2.....5.....8.6......1....",
+    "48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....",
+    "8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..",
+)
+
+
+def _corpus(per_level=100):
+    from emulator import FirmwareEmulator, HOLES
+
+    fw = FirmwareEmulator(seed=7)
+    corpus = {}
+    for level in HOLES:
+        boards = []
+        for _ in range(per_level):
+            fw.generate_sudoku(HOLES[level])
+            boards.append(bytes(fw.matrix))
+        corpus[f"level {level}"] = boards
+    corpus["hard"] = [parse(p) for p in HARD]
+    return corpus
+
+
+def _bench():
+    for name, boards in _corpus().items():
+        times = []
+        multi = 0
+        for board in boards:
+            t = time.perf_counter()
+            sol, n = solve_unique(board)
+            times.append((time.perf_counter() - t) * 1000)
+            assert sol is not None
+            multi += n > 1
+        times.sort()
+        print(f"{name:8s}: {len(boards):4d} boards  p50 {times[len(times) // 2]:7.3f} ms  "
+              f"max {times[-1]:7.3f} ms  non-unique {multi}")
+
+    # Те, що перевіряє GUI: поле посеред партії після ходу (count_solutions, limit=1)
+    import random
+    rnd = random.Random(1)
+    for name, boards in _corpus().items():
+        times = []
+        dead = 0
+        for board in boards:
+            sol = solve(board)
+            cells = bytearray(board)
+            empty = [i for i in range(81) if not cells[i]]
+            rnd.shuffle(empty)
+            for i in empty[:len(empty) // 3]:
+                cells[i] = sol[i]
+            # Один хід, що не суперечить правилам, але не з розв'язку
+            i = empty[-1]
+            used = {cells[j] for j in range(81) if ROW[j] == ROW[i] or COL[j] == COL[i] or BOX[j] == BOX[i]}
+            wrong = [v for v in range(1, 10) if v != sol[i] and v not in used]
+            if wrong:
+                cells[i] = wrong[0]
+            t = time.perf_counter()
+            dead += count_solutions(cells, limit=1) == 0
+            times.append((time.perf_counter() - t) * 1000)
+        times.sort()
+        print(f"{name:8s}: mid-game check  p50 {times[len(times) // 2]:7.3f} ms  "
+              f"max {times[-1]:7.3f} ms  unsolvable {dead}")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,110 @@
+import collections
+import threading
+
+
+class UiEventQueue:
+    # Черга подій RX-потік -> Tk. Замість root.after(0, ...) на кожен пакет
+    # RX-потік кладе виклик сюди, а один періодичний тік Tk розбирає все разом.
+    # Події з ключем (поле, прогрес) — "виграє найновіша": попередня ще не
+    # виконана подія з тим самим ключем викидається. Події без ключа
+    # (ходи, очищення, відповіді планувальнику) виконуються строго по черзі.
+    # При переповненні викидаються лише події з droppable=True (чисто візуальні
+    # спалахи); решта — зміни стану, тож черга радше виросте понад maxlen.
+
+    def __init__(self, root, maxlen=256, tick_ms=15):
+        self.root = root
+        self.maxlen = maxlen
+        self.tick_ms = tick_ms
+
+        self._lock = threading.Lock()
+        self._events = collections.deque()  # [key, fn, args, droppable]; fn=None — витіснена подія
+        self._latest = {}                   # key -> слот у _events
+        self._dead = 0
+
+        self.posted = 0
+        self.coalesced = 0  # замінено новішою подією з тим самим ключем
+        self.dropped = 0    # викинуто через переповнення (лише droppable)
+        self.overflow = 0   # переповнення, коли викинути не було чого
+        self.max_depth = 0
+
+        self._tick_id = None
+
+    @property
+    def depth(self):
+        return len(self._events) - self._dead
+
+    def post(self, fn, *args, key=None, droppable=False):
+        # Викликається з будь-якого потоку
+        with self._lock:
+            self.posted += 1
+            if key is not None:
+                old = self._latest.get(key)
+                if old is not None:
+                    old[1] = None
+                    self._dead += 1
+                    self.coalesced += 1
+
+            if len(self._events) >= self.maxlen:
+                self._compact()
+                if len(self._events) >= self.maxlen:
+                    self._drop_oldest()
+
+            slot = [key, fn, args, droppable]
+            self._events.append(slot)
+            if key is not None:
+                self._latest[key] = slot
+            depth = len(self._events) - self._dead
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def _drop_oldest(self):
+        # Викидається найстаріший спалах; змін поля, журналу й відповідей
+        # планувальнику серед кандидатів немає
+        for i, e in enumerate(self._events):
+            if e[3]:
+                del self._events[i]
+                if e[0] is not None:
+                    del self._latest[e[0]]
+                self.dropped += 1
+                return
+        self.overflow += 1
+
+    def _compact(self):
+        if self._dead:
+            self._events = collections.deque(e for e in self._events if e[1] is not None)
+            self._dead = 0
+
+    def drain(self):
+        with self._lock:
+            if not self._events:
+                return 0
+            events = self._events
+            self._events = collections.deque()
+            self._latest.clear()
+            self._dead = 0
+        n = 0
+        for _, fn, args, _ in events:
+            if fn is not None:
+                fn(*args)
+                n += 1
+        return n
+
+    # ================= TK TICK =================
+    def start(self):
+        if self._tick_id is None:
+            self._tick_id = self.root.after(self.tick_ms, self._tick)
+
+    def stop(self):
+        if self._tick_id is not None:
+            self.root.after_cancel(self._tick_id)
+            self._tick_id = None
+
+    def _tick(self):
+        try:
+            self.drain()
+        finally:
+            self._tick_id = self.root.after(self.tick_ms, self._tick)
+
+    def stats(self):
+        return {"depth": self.depth, "max_depth": self.max_depth, "posted": self.posted,
+                "coalesced": self.coalesced, "dropped": self.dropped, "overflow": self.overflow}